@@ -29,6 +29,16 @@ class AppConfig(BaseModel):
     share_chat_ttl_seconds: int = Field(default=(60 * 60 * 24) * 30, description="Time to live for shared chat sessions in seconds. Default is 30 days.")
     show_modal_error_messages: bool = Field(default=True, description="Whether to show error messages in a modal dialog. If False, errors will be logged but not displayed to the user.")
     show_function_calls: bool = Field(default=False, description="Whether to show function calls in the UI.")
+    enable_fan_out: bool = Field(default=False, description="Whether to offer fan-out mode when multiple agents are configured. In fan-out mode each message is sent to all selected agents concurrently, and their responses are shown side by side. Also uses a wide page layout to make room for the columns.")
+
+    log_sample_rates: Dict[str, float] = Field(default_factory=dict, description="Fraction of log events to keep, keyed by event name, for thinning out high-volume events (e.g. {\"tool_call\": 0.1}). Events not listed are always logged.")
+    metrics_port: Optional[int] = Field(default=None, description="If set, serve process-wide metrics in Prometheus text format at http://<metrics_host>:<metrics_port>/metrics.")
+    metrics_host: str = Field(default="127.0.0.1", description="Interface for the metrics endpoint. Use 0.0.0.0 to allow scraping from other hosts.")
+    metrics_file: Optional[str] = Field(default=None, description="If set, periodically write process-wide metrics in Prometheus text format to this file (e.g. for node_exporter's textfile collector).")
+    metrics_file_interval_seconds: float = Field(default=15.0, gt=0, description="How often to rewrite metrics_file, in seconds.")
+    enable_warmup: bool = Field(default=True, description="Whether to warm up each process in the background when it serves its first session: building models and their HTTP clients, resolving their API hosts, and checking the share store. Step timings are logged and recorded in metrics.")
+    warmup_toolsets: bool = Field(default=False, description="Whether warm-up also starts and stops each agent's toolsets (e.g. MCP servers, downloading and caching their packages on first use). Turns started meanwhile wait for this step to finish. Requires enable_warmup.")
+    journal_store: Any = Field(default=None, exclude=True, description="A JournalStore (see opaiui.journal) to which each finished turn is appended in the background. Sessions are identified by a journal_id URL parameter, and are rebuilt from their journal when opened in a new process. If None, chats live only in memory.")
 
     rendering_functions: List[Callable[[Any], None]] = Field(
         default_factory=list, description="List of async functions which may be called from agent tools using `render_in_chat`. WARNING: rendering_functions is deprecated in AppConfig, use agent-specific AgentConfig.rendering_functions instead. This will be removed in a future version."
@@ -49,6 +59,14 @@ class AppConfig(BaseModel):
             raise ValueError("All rendering functions must be async functions (defined with async def).")
         return v
 
+    @field_validator("log_sample_rates", mode="after")
+    @classmethod
+    def validate_log_sample_rates(cls, v):
+        bad_rates = {event: rate for event, rate in v.items() if not 0.0 <= rate <= 1.0}
+        if bad_rates:
+            raise ValueError(f"Invalid log sample rates: {bad_rates}. Rates must be between 0 and 1.")
+        return v
+
 class DisplayMessage(BaseModel):
     model_message: Optional[ModelMessage] = None
     render_func: Optional[str] = None
@@ -79,6 +97,25 @@ class AgentConfig(BaseModel):
     hide_suggested_questions_after_first_interaction: bool = Field(
         default=False, description="If True, suggested questions will be hidden after the user's first interaction. Useful for onboarding-only suggested questions. Note: user can still toggle them back on via Settings."
     )
+    suggestion_generator: Any = Field(
+        default=None, exclude=True, description="Model name or Pydantic.AI Model instance (typically a small, cheap one), or an async function taking (history messages, deps) and returning a list of questions, used to generate follow-up suggested questions after each turn. Generation runs in the background, so it doesn't delay the response; the suggestions appear when ready. Results are cached per conversation history. If None, suggested questions only change via set_suggested_questions()."
+    )
+    suggestion_count: int = Field(
+        default=3, gt=0, description="Maximum number of suggested questions to generate with suggestion_generator."
+    )
+
+    first_token_timeout_seconds: Optional[float] = Field(
+        default=None, gt=0, description="Maximum time to wait for the first streamed event of each model request. If None, waits as long as the provider takes."
+    )
+    request_timeout_seconds: Optional[float] = Field(
+        default=None, gt=0, description="Maximum time for a single model request to finish streaming, measured from when the request is sent. If None, no limit is applied."
+    )
+    fallback_model: Any = Field(
+        default=None, exclude=True, description="Model name or Pydantic.AI Model instance to use when the agent's model misses a deadline. The turn is re-run on this model with the same prompt, history, and deps, but only if it hasn't called any tools yet; after that, a missed deadline ends the turn, so tools' side effects aren't repeated. If None, a missed deadline ends the turn with an error message."
+    )
+    hedge_requests: bool = Field(
+        default=False, description="If True (and fallback_model is set), a missed first-token deadline starts the fallback model alongside the still-pending request and keeps whichever streams first, rather than abandoning the original request."
+    )
 
     _usage: Usage = PrivateAttr(default_factory=Usage)
     _history_messages: List[ModelMessage] = PrivateAttr(default_factory=list)
@@ -87,6 +124,7 @@ class AgentConfig(BaseModel):
     _current_suggested_questions: List[str] = PrivateAttr(default_factory=list) # current list of suggested questions
     _has_had_first_interaction: bool = PrivateAttr(default=False) # tracks whether user has had their first interaction
     _auto_hide_performed: bool = PrivateAttr(default=False) # tracks whether we've already performed the auto-hide once
+    _suggestions_future: Any = PrivateAttr(default=None) # pending background generation of suggested questions, if any
 
 
     model_config = ConfigDict(
@@ -102,7 +140,7 @@ class AgentConfig(BaseModel):
         return v
 
     def serializable_dict(self):
-        base = self.model_dump(exclude={"agent", "sidebar_func", "deps", "rendering_functions"}) # private attributes are not included by default; exclude rendering_functions since functions can't be serialized
+        base = self.model_dump(exclude={"agent", "sidebar_func", "deps", "rendering_functions", "fallback_model", "suggestion_generator"}) # private attributes are not included by default; exclude rendering_functions since functions can't be serialized
         base["_usage"] = base64.b64encode(dill.dumps(self._usage)).decode("utf-8") if self._usage else None
         base["_history_messages"] = base64.b64encode(dill.dumps(self._history_messages)).decode("utf-8") if self._history_messages else None
         base["_display_messages"] = base64.b64encode(dill.dumps(self._display_messages)).decode("utf-8") if self._display_messages else None
@@ -117,7 +155,7 @@ class AgentConfig(BaseModel):
         return base
 
     @classmethod
-    def from_serializable(cls, data: dict, agent=None, sidebar_func=None, deps=None):
+    def from_serializable(cls, data: dict, agent=None, sidebar_func=None, deps=None, fallback_model=None, suggestion_generator=None):
         """Create an AgentConfig instance from a serializable dict."""
         usage = Usage()
         if "_usage" in data and data["_usage"] is not None:
@@ -149,11 +187,13 @@ class AgentConfig(BaseModel):
         if "deps_state" in data and data["deps_state"] is not None:
             deps_state = dill.loads(base64.b64decode(data["deps_state"]))
         # Remove runtime-only keys from data before constructing
-        data = {k: v for k, v in data.items() if k not in ("agent", "sidebar_func", "deps", "rendering_functions", "_display_messages", "_current_suggested_questions", "_has_had_first_interaction", "_auto_hide_performed")}
+        data = {k: v for k, v in data.items() if k not in ("agent", "sidebar_func", "deps", "rendering_functions", "fallback_model", "suggestion_generator", "_display_messages", "_current_suggested_questions", "_has_had_first_interaction", "_auto_hide_performed")}
         obj = cls(**data, rendering_functions=[])  # Initialize with empty list, will be restored from session state
         obj.agent = agent
         obj.deps = deps
         obj.sidebar_func = sidebar_func
+        obj.fallback_model = fallback_model
+        obj.suggestion_generator = suggestion_generator
         if deps_state is not None:
             obj.deps.state = deps_state
         obj._usage = usage
@@ -10,12 +10,22 @@ import os
 import json
 from typing import Any, Callable, List, Optional
 from opaiui import AgentConfig, AppConfig, AgentState
+from opaiui import journal
+from opaiui import log
+from opaiui import metrics
+from opaiui import suggestions
+from opaiui import warmup
 import inspect
 
 import dill
 import hashlib
 import urllib
 import traceback
+import time
+import contextlib
+import contextvars
+import uuid
+import weakref
 
 from pydantic_ai.messages import (
     FinalResultEvent,
@@ -26,6 +36,7 @@ from pydantic_ai.messages import (
     TextPartDelta,
     ToolCallPartDelta,
     ThinkingPart,
+    ThinkingPartDelta,
     TextPart,
     ToolCallPart,
     ModelResponse,
@@ -36,6 +47,7 @@ from pydantic_ai.messages import (
     RetryPromptPart,
 )
 from pydantic_ai import RunContext
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 
 
 def current_deps():
@@ -47,9 +59,38 @@ def current_deps():
         raise ValueError("No current agent configuration found in session state.")
 
 
+# name of the agent being run or rendered by the current task; set while fanning out to several agents
+_active_agent_name = contextvars.ContextVar("opaiui_active_agent_name", default=None)
+# id of the agent turn being run by the current task, for log records
+_turn_id = contextvars.ContextVar("opaiui_turn_id", default=None)
+
+
+def _current_agent_name():
+    """Get the name of the agent the current task is working with, defaulting to the sidebar selection."""
+    return _active_agent_name.get() or st.session_state.current_agent_name
+
+
+@contextlib.contextmanager
+def _agent_context(agent_name: str):
+    """Make agent_name the current agent for code run within the block (and tasks started from it)."""
+    token = _active_agent_name.set(agent_name)
+    try:
+        yield
+    finally:
+        _active_agent_name.reset(token)
+
+
 def _current_agent_config():
     """Get the current agent configuration."""
-    return st.session_state.agent_configs.get(st.session_state.current_agent_name, None)
+    return st.session_state.agent_configs.get(_current_agent_name(), None)
+
+
+def _fan_out_agent_names():
+    """Get the agents selected for fan-out, or an empty list if prompts go to the current agent only."""
+    if not st.session_state.app_config.enable_fan_out:
+        return []
+    names = [name for name in st.session_state.get("fan_out_agent_names", []) if name in st.session_state.agent_configs]
+    return names if len(names) > 1 else []
 
 
 async def _render_sidebar():
@@ -75,6 +116,13 @@ async def _render_sidebar():
                                       disabled=st.session_state.lock_widgets, 
                                       label_visibility="visible", )
 
+        if st.session_state.app_config.enable_fan_out and len(agent_names) > 1:
+            st.multiselect(label = "Compare agents:",
+                           options=agent_names,
+                           key="fan_out_agent_names",
+                           disabled=st.session_state.lock_widgets,
+                           help = "Send each message to all selected agents at once, and show their responses side by side. Select at least two agents.")
+
         current_config = _current_agent_config()
         if hasattr(current_config, "sidebar_func") and callable(current_config.sidebar_func):
             sig = inspect.signature(current_config.sidebar_func)
@@ -92,23 +140,19 @@ async def _render_sidebar():
         st.caption(f"Input tokens: {current_config._usage.request_tokens or 0} Output tokens: {current_config._usage.response_tokens or 0}")
 
             
-        if "UPSTASH_REDIS_REST_URL" in os.environ and "UPSTASH_REDIS_REST_TOKEN" in os.environ and "upstash_active" not in st.session_state:
-            redis = None
-            try:
-                redis = Redis.from_env()
-                dbsize = redis.dbsize()
-                st.session_state.logger.info(f"Initializing session with sharing enabled. Shared chats DB size: {dbsize}")
-                st.session_state["upstash_active"] = True
-
-            except Exception as e:
-                _log_error(f"Error connecting to upstash database, or no database to connect to. Error:\n{e}")
-
-            finally:
-                if redis is not None:
-                    try:
-                        redis.close()
-                    except Exception as e:
-                        _log_error(f"Error closing Redis connection: {e}")
+        if warmup.share_store_configured() and "upstash_active" not in st.session_state:
+            # the store is checked once per process in the background (see opaiui.warmup); until then, sharing isn't offered
+            share_store_status = warmup.share_store_status()
+            if share_store_status is None:
+                _rerun_when_share_store_checked()
+            else:
+                ok, detail = share_store_status
+                if ok:
+                    st.session_state.logger.info(f"Initializing session with sharing enabled. Shared chats DB size: {detail}")
+                    st.session_state["upstash_active"] = True
+                else:
+                    _log_error(f"Error connecting to upstash database, or no database to connect to. Error:\n{detail}")
+                    st.session_state["upstash_active"] = None
 
         if "upstash_active" in st.session_state and st.session_state.upstash_active is not None:
             col1, col2 = st.columns(2)
@@ -137,7 +181,7 @@ async def _render_sidebar():
             
             # Show suggested questions toggle if there are questions configured
             current_config = _current_agent_config()
-            has_questions = (current_config.suggested_questions and 
+            has_questions = ((current_config.suggested_questions or current_config.suggestion_generator is not None) and
                            current_config._current_suggested_questions)
             if has_questions:
                 st.checkbox("💡 Show suggested questions",
@@ -149,6 +193,13 @@ async def _render_sidebar():
         st.markdown("---")
 
 
+@st.fragment(run_every=0.5)
+def _rerun_when_share_store_checked():
+    """Polls while the share store is checked in the background, rerunning the page once the check has finished."""
+    if warmup.share_store_status() is not None:
+        st.rerun()
+
+
 def _seconds_to_days_hours(ttl_seconds):
     # we need to convert the time to a human-readable format, e.g. 28 days, 18 hours (rounded to nearest hour)
     # we don't want the default datetime.timedelta format
@@ -169,6 +220,16 @@ def _seconds_to_days_hours(ttl_seconds):
 
 
 def _clear_chat_current_agent():
+    """Clear the chat for the current agent (or all agents being compared in fan-out mode)."""
+    for agent_name in _fan_out_agent_names() or [st.session_state.current_agent_name]:
+        with _agent_context(agent_name):
+            _clear_chat_agent()
+        _journal_entries([journal.clear_entry(agent_name)])
+
+    st.session_state.lock_widgets = False
+
+
+def _clear_chat_agent():
     """Clear the chat for the current agent."""
     current_agent_config = _current_agent_config()
     current_agent_config._display_messages = []
@@ -178,6 +239,7 @@ def _clear_chat_current_agent():
     # Reset suggested questions to initial state
     current_agent_config._has_had_first_interaction = False
     current_agent_config._auto_hide_performed = False  # Reset so auto-hide can happen again
+    current_agent_config._suggestions_future = None  # Discard suggestions still being generated for the old chat
     if current_agent_config.suggested_questions is not None:
         current_agent_config._current_suggested_questions = list(current_agent_config.suggested_questions)
     else:
@@ -187,13 +249,18 @@ def _clear_chat_current_agent():
     if current_agent_config.hide_suggested_questions_after_first_interaction:
         st.session_state.show_suggested_questions = True
 
-    st.session_state.lock_widgets = False
-
 
 def _lock_ui():
     st.session_state.lock_widgets = True
 
 
+def _submit_chat_input():
+    _lock_ui()
+    # newer Streamlit releases discard the value of a widget that is disabled when it renders, which the
+    # chat input is by the time the script reads it, so the prompt is kept for _handle_chat_input here
+    st.session_state.submitted_prompt = st.session_state.get("chat_input")
+
+
 # helper function to pull only the fields that are defined in 
 # the node's class, excluding inherited fields
 def _simplify_model(node):
@@ -209,99 +276,428 @@ def _simplify_model(node):
     return own_fields
 
 
-def _sync_generator_from_async(async_iter):
-    loop = asyncio.get_event_loop()
-    async def consume():
-        async for item in async_iter:
-            yield item
-    iterator = consume().__aiter__()
-    while True:
-        try:
-            yield loop.run_until_complete(iterator.__anext__())
-        except StopIteration:
-            break
-        except StopAsyncIteration:
-            break
-
-
 def set_status(**kwargs):
     if "label" not in kwargs:
         _log_error("Named parameter 'label' is required in set_status().")
     if "width" in kwargs:
         _log_error("Parameter 'width' is not supported in set_state().")
-    if "status_box" in st.session_state:
-        st.session_state.status_box.update(**kwargs)
+    # each agent gets its own status box, since several may be running at once in fan-out mode
+    status_key = f"status_box_{_current_agent_name()}"
+    if status_key in st.session_state:
+        st.session_state[status_key].update(**kwargs)
         # I don't know why, but st.status is not adding to the expander properly, so we do it manually:
-        st.session_state.status_box.write(kwargs.get("label", ""))
+        st.session_state[status_key].write(kwargs.get("label", ""))
     else:
-        st.session_state.status_box = st.status(**kwargs)
+        st.session_state[status_key] = st.status(**kwargs)
 
 
 def _reset_status():
-    del st.session_state.status_box
+    del st.session_state[f"status_box_{_current_agent_name()}"]
+
+
+_STREAM_UPDATE_INTERVAL_SECONDS = 0.05
+
+
+class _StreamChannel:
+    """A live view of one part of a streamed model response: its text, thinking, or tool-call arguments."""
+
+    def __init__(self, kind: str, content: str = "", tool_name: str = ""):
+        self.kind = kind
+        self.content = content
+        self.tool_name = tool_name
+        self.placeholder = None
+        self.last_draw = 0.0
+        self.dirty = bool(content)
+
+    def draw(self):
+        if not self.content.strip():
+            # nothing visible yet; left dirty, the stream view would keep finding this update due
+            self.dirty = False
+            return
+        if self.placeholder is None:
+            # thinking gets a collapsible block, created once so a reader's expand/collapse choice sticks while it streams
+            self.placeholder = st.expander("💭 Thinking", expanded=True).empty() if self.kind == "thinking" else st.empty()
+        if self.kind == "tool_call":
+            with self.placeholder.container():
+                st.caption(f"🛠️ {self.tool_name}")
+                st.code(self.content, language="json")
+        else:
+            self.placeholder.markdown(self.content, unsafe_allow_html=True)
+        self.last_draw = time.monotonic()
+        self.dirty = False
+
+
+class _StreamView:
+    """Renders a model response as it streams, with a separate live channel per part.
+
+    Every channel shares the same batched updates: the first output is drawn right away, later
+    updates at most every _STREAM_UPDATE_INTERVAL_SECONDS, and anything pending when a part or
+    the response ends. Pending updates are also drawn once due if no further events arrive
+    (see next_draw), so a stalled stream doesn't hide text it has already received.
+    """
+
+    def __init__(self):
+        self.channels: Dict[int, _StreamChannel] = {}
+
+    def handle(self, event) -> str:
+        """Apply a model stream event to its channel. Returns the response text it added, if any."""
+        text = ""
+        if isinstance(event, PartStartEvent):
+            # a new part means the previous ones are complete
+            self.flush()
+            part = event.part
+            if isinstance(part, TextPart):
+                channel, text = _StreamChannel("text", part.content), part.content
+            elif isinstance(part, ThinkingPart):
+                channel = _StreamChannel("thinking", part.content)
+            elif isinstance(part, ToolCallPart):
+                args = part.args if isinstance(part.args, str) or part.args is None else json.dumps(part.args)
+                channel = _StreamChannel("tool_call", args or "", part.tool_name)
+            else:
+                return text
+            self.channels[event.index] = channel
+
+        elif isinstance(event, PartDeltaEvent):
+            delta = event.delta
+            if isinstance(delta, TextPartDelta):
+                channel, text = self.channels.setdefault(event.index, _StreamChannel("text")), delta.content_delta
+                channel.content += text
+            elif isinstance(delta, ThinkingPartDelta):
+                channel = self.channels.setdefault(event.index, _StreamChannel("thinking"))
+                channel.content += delta.content_delta or ""
+            elif isinstance(delta, ToolCallPartDelta):
+                channel = self.channels.setdefault(event.index, _StreamChannel("tool_call"))
+                channel.tool_name += delta.tool_name_delta or ""
+                if isinstance(delta.args_delta, str):
+                    channel.content += delta.args_delta
+                elif delta.args_delta is not None:
+                    channel.content = json.dumps(delta.args_delta)
+            else:
+                return text
+            channel.dirty = True
+        else:
+            return text
+
+        if channel.dirty and time.monotonic() - channel.last_draw >= _STREAM_UPDATE_INTERVAL_SECONDS:
+            channel.draw()
+        return text
 
+    def flush(self):
+        """Draw any updates still pending."""
+        for channel in self.channels.values():
+            if channel.dirty:
+                channel.draw()
+
+    def next_draw(self) -> Optional[float]:
+        """Monotonic time at which the earliest pending update is due to be drawn, or None if nothing is pending."""
+        due = [channel.last_draw + _STREAM_UPDATE_INTERVAL_SECONDS for channel in self.channels.values() if channel.dirty]
+        return min(due) if due else None
+
+
+class _TurnAttempt:
+    """A single agent run for one chat turn.
+
+    The run executes in its own task and forwards its events through a queue, so the
+    turn can enforce deadlines on it, race it against a hedged request, or abandon it.
+    """
+
+    def __init__(self, agent_config: AgentConfig, prompt: str, model=None, label: str = "primary"):
+        self.label = label
+        self.model = model
+        self.text = ""  # text streamed by this attempt so far, kept if the attempt is abandoned
+        self.ran_tools = False  # whether this attempt has started any tool calls; re-running the turn would repeat them
+        self.queue = asyncio.Queue()
+        self.task = asyncio.ensure_future(self._run(agent_config, prompt))
+
+    async def _run(self, agent_config: AgentConfig, prompt: str):
+        try:
+            async with agent_config.agent.iter(prompt,
+                                               deps = agent_config.deps,
+                                               message_history = agent_config._history_messages,
+                                               usage = agent_config._usage,
+                                               model = self.model) as run:
+                async for node in run:
+                    if Agent.is_model_request_node(node):
+                        # the request is sent when the stream is opened, so the deadline clock starts here
+                        await self.queue.put(("request_start", None))
+                        async with node.stream(run.ctx) as request_stream:
+                            async for event in request_stream:
+                                await self.queue.put(("model_event", event))
+                        await self.queue.put(("request_end", None))
+
+                    elif Agent.is_call_tools_node(node):
+                        async with node.stream(run.ctx) as handle_stream:
+                            async for event in handle_stream:
+                                await self.queue.put(("tool_event", event))
+
+            await self.queue.put(("done", run.result))
+        except Exception as e:
+            await self.queue.put(("error", e))
+
+    async def cancel(self):
+        self.task.cancel()
+        await asyncio.gather(self.task, return_exceptions=True)
+
+
+async def _race_attempts(primary: _TurnAttempt, hedge: _TurnAttempt, deadline: Optional[float]):
+    """Waits for the first model output from either attempt.
+
+    Returns the winning attempt and the event it produced, or (None, None) if neither
+    produced output before the deadline. Raises the last error if both attempts fail.
+    """
+    pending = {asyncio.ensure_future(primary.queue.get()): primary,
+               asyncio.ensure_future(hedge.queue.get()): hedge}
+    error = None
+    try:
+        while pending:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            done, _ = await asyncio.wait(pending.keys(), timeout = timeout, return_when = asyncio.FIRST_COMPLETED)
+            if not done:
+                return None, None
+
+            for fut in done:
+                attempt = pending.pop(fut)
+                kind, payload = fut.result()
+                if kind == "request_start":
+                    # the hedge has only just sent its request; keep waiting for its output
+                    pending[asyncio.ensure_future(attempt.queue.get())] = attempt
+                elif kind == "error":
+                    st.session_state.logger.warning(f"{attempt.label} attempt failed while hedging: {payload}")
+                    error = payload
+                else:
+                    return attempt, (kind, payload)
+        raise error
+    finally:
+        for fut in pending:
+            fut.cancel()
+
+
+def _latency_reason_text(reason: str) -> str:
+    return "no response within first-token deadline" if reason == "first_token" else "request timed out"
+
+
+def _log_latency_event(event: str, reason: str, elapsed: float):
+    """Reports a hedge, failover, or timeout to the logger and the status box."""
+    metrics.LATENCY_EVENTS.inc(agent=_current_agent_name(), event=event)
+    info = {"event": event,
+            "reason": reason,
+            "elapsed_seconds": round(elapsed, 3)}
+    st.session_state.logger.warning(info)
+
+    reason_text = _latency_reason_text(reason)
+    if event == "hedge":
+        set_status(label = f"Model slow to respond ({reason_text}); hedging with fallback model...")
+    elif event == "failover":
+        set_status(label = f"Model slow to respond ({reason_text}); switching to fallback model...")
+    else:
+        set_status(label = f"Model did not respond in time ({reason_text}).", state = "error")
+
+
+def _partial_display_messages(attempts):
+    """DisplayMessages preserving the text streamed by abandoned attempts."""
+    return [DisplayMessage(model_message=ModelResponse(parts=[TextPart(content=attempt.text.rstrip() + " ...")]), before_agent_response=True)
+            for attempt in attempts if attempt.text]
+
+
+async def _stream_agent_turn(prompt: str, agent_config: AgentConfig):
+    """Streams one turn of the agent into the current chat message, applying the agent's latency policy.
+
+    Returns a (result, partial_messages, timeout_reason) tuple. result is the run result, or None if
+    the turn timed out, in which case timeout_reason is the deadline that was missed ("first_token"
+    or "request_timeout"); partial_messages holds DisplayMessages for text streamed by abandoned attempts.
+    """
+    first_token_timeout = agent_config.first_token_timeout_seconds
+    request_timeout = agent_config.request_timeout_seconds
+    # a fallback re-runs the turn (and its tools), so renders queued by an abandoned attempt are dropped
+    delayed_count = len(agent_config._delayed_messages)
+
+    turn_started = time.monotonic()
+    first_output_logged = False
+    attempt = _TurnAttempt(agent_config, prompt)
+    abandoned = []
+    view = None  # live rendering of the current model request's response
+    request_started = None  # monotonic time the current model request was sent, None between requests
+    request_has_output = False
+
+    try:
+        while True:
+            deadline, reason = None, None
+            if request_started is not None:
+                if request_timeout is not None:
+                    deadline, reason = request_started + request_timeout, "request_timeout"
+                if first_token_timeout is not None and not request_has_output and (deadline is None or request_started + first_token_timeout < deadline):
+                    deadline, reason = request_started + first_token_timeout, "first_token"
+
+            # wake up for pending stream updates too, in case the model stalls before sending more
+            next_draw = view.next_draw() if view is not None else None
+            draw_first = next_draw is not None and (deadline is None or next_draw < deadline)
+            wake = next_draw if draw_first else deadline
+
+            try:
+                timeout = None if wake is None else max(0.0, wake - time.monotonic())
+                kind, payload = await asyncio.wait_for(attempt.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                if draw_first:
+                    view.flush()
+                    continue
+                elapsed = time.monotonic() - request_started
+                # once tools have run, their side effects (and changes to deps) can't be undone, so the turn isn't re-run
+                if agent_config.fallback_model is None or attempt.label == "fallback" or attempt.ran_tools:
+                    _log_latency_event("timeout", reason, elapsed)
+                    abandoned.append(attempt)
+                    await attempt.cancel()
+                    return None, _partial_display_messages(abandoned), reason
+
+                if reason == "first_token" and agent_config.hedge_requests:
+                    _log_latency_event("hedge", reason, elapsed)
+                    hedge = _TurnAttempt(agent_config, prompt, model = agent_config.fallback_model, label = "fallback")
+                    hedge_deadline = None if request_timeout is None else request_started + request_timeout
+                    winner, event = await _race_attempts(attempt, hedge, hedge_deadline)
+                    if winner is None:
+                        _log_latency_event("timeout", "request_timeout", time.monotonic() - request_started)
+                        abandoned.extend([attempt, hedge])
+                        await hedge.cancel()
+                        await attempt.cancel()
+                        return None, _partial_display_messages(abandoned), "request_timeout"
+
+                    st.session_state.logger.info({"event": "hedge_result", "winner": winner.label})
+                    await (hedge if winner is attempt else attempt).cancel()
+                    if winner is hedge:
+                        abandoned.append(attempt)
+                        del agent_config._delayed_messages[delayed_count:]
+                        request_started, view = time.monotonic(), _StreamView()
+                    attempt = winner
+                    kind, payload = event
+                else:
+                    _log_latency_event("failover", reason, elapsed)
+                    abandoned.append(attempt)
+                    await attempt.cancel()
+                    del agent_config._delayed_messages[delayed_count:]
+                    attempt = _TurnAttempt(agent_config, prompt, model = agent_config.fallback_model, label = "fallback")
+                    request_started, request_has_output = None, False
+                    continue
+
+            if kind == "request_start":
+                request_started, request_has_output, view = time.monotonic(), False, _StreamView()
+            elif kind == "request_end":
+                request_started = None
+                view.flush()
+            elif kind == "model_event":
+                if not request_has_output:
+                    request_has_output = True
+                    set_status(label = "Answering...")
+                if not first_output_logged:
+                    first_output_logged = True
+                    first_output_seconds = time.monotonic() - turn_started
+                    st.session_state.logger.info({"event": "first_token", "seconds": round(first_output_seconds, 3)})
+                    metrics.FIRST_TOKEN_SECONDS.observe(first_output_seconds, agent=_current_agent_name())
+                attempt.text += view.handle(payload)
+            elif kind == "tool_event":
+                if isinstance(payload, FunctionToolCallEvent):
+                    attempt.ran_tools = True
+                    args_str = ", ".join(f"{k}={json.dumps(v)}" for k, v in payload.part.args_as_dict().items())
+                    if len(args_str) > 50:
+                        args_str = args_str[:50] + "..."
+                    set_status(label = f"Calling tool: {payload.part.tool_name}({args_str})")
+                    st.session_state.logger.info({"event": "tool_call", "tool": payload.part.tool_name})
+                elif isinstance(payload, FunctionToolResultEvent):
+                    set_status(label = f"Processing {payload.result.tool_name} result")
+                    st.session_state.logger.info({"event": "tool_result", "tool": payload.result.tool_name})
+            elif kind == "error":
+                raise payload
+            elif kind == "done":
+                return payload, _partial_display_messages(abandoned), None
+    finally:
+        if view is not None:
+            view.flush()
+        if not attempt.task.done():
+            await attempt.cancel()
 
 
 async def _process_input(prompt):
+    fan_out_names = _fan_out_agent_names()
+    if fan_out_names:
+        await _process_input_fan_out(prompt, fan_out_names)
+        return
+
     with st.chat_message("user", avatar=st.session_state.app_config.user_avatar):
         st.markdown(prompt, unsafe_allow_html=True)
 
-    prompt = prompt.strip()
+    await _run_agent_turn(prompt.strip())
+
+    st.session_state.lock_widgets = False  # Step 5: Unlock the UI   
+    st.rerun()
+
+
+async def _process_input_fan_out(prompt, agent_names):
+    """Send the prompt to several agents concurrently, streaming their responses side by side."""
+    columns = st.columns(len(agent_names))
+
+    async def run_in_column(column, agent_name):
+        # each agent runs in its own task, so the column and current agent set here don't leak into the others
+        with column, _agent_context(agent_name):
+            with st.chat_message("user", avatar=st.session_state.app_config.user_avatar):
+                st.markdown(prompt, unsafe_allow_html=True)
+            await _run_agent_turn(prompt.strip())
+
+    results = await asyncio.gather(*(run_in_column(column, name) for column, name in zip(columns, agent_names)), return_exceptions=True)
+    for agent_name, result in zip(agent_names, results):
+        if isinstance(result, Exception):
+            _log_error(f"Error running agent {agent_name}: {result}")
+
+    st.session_state.lock_widgets = False
+    st.rerun()
+
+
+async def _run_agent_turn(prompt):
+    """Run the current agent on the prompt, streaming its response and recording the turn in its history."""
+    agent_name = _current_agent_name()
+    token = _turn_id.set(uuid.uuid4().hex[:16])
+    metrics.ACTIVE_RUNS.inc(agent=agent_name)
+    try:
+        await _stream_and_record_turn(prompt)
+    except Exception:
+        metrics.TURNS.inc(agent=agent_name, outcome="error")
+        raise
+    finally:
+        metrics.ACTIVE_RUNS.dec(agent=agent_name)
+        _turn_id.reset(token)
 
-    session_id = st.runtime.scriptrunner.add_script_run_ctx().streamlit_script_run_ctx.session_id
-    info = {"session_id": session_id, "message": prompt, "agent": st.session_state.current_agent_name}
-    st.session_state.logger.info(info)
+
+async def _stream_and_record_turn(prompt):
+    turn_started = time.monotonic()
+    st.session_state.logger.info({"event": "user_message", "message": prompt})
 
     current_agent_config = _current_agent_config()
+    request_tokens_start = current_agent_config._usage.request_tokens or 0
+    response_tokens_start = current_agent_config._usage.response_tokens or 0
 
     current_agent = current_agent_config.agent
-    current_usage = current_agent_config._usage
-    current_deps = current_agent_config.deps
     current_history = current_agent_config._history_messages
     current_display_messages = current_agent_config._display_messages
+    history_start, display_start = len(current_history), len(current_display_messages)
 
     with st.chat_message("assistant", avatar = current_agent_config.agent_avatar):
         set_status(label = "Checking available resources...")
+        await warmup.wait_for_toolsets()
         async with current_agent.run_mcp_servers():
-            async with current_agent.iter(prompt, deps = current_deps, message_history = current_history, usage = current_usage) as run:
-                async for node in run:
-                    if Agent.is_user_prompt_node(node):
-                        pass
-
-                    elif Agent.is_model_request_node(node):
-                        async with node.stream(run.ctx) as request_stream:
-
-                            def _extract_streamable_text(sync_stream):
-                                """Extracts text from a sync stream."""
-                                for event in sync_stream:
-                                    if isinstance(event, PartStartEvent):
-                                        # toolcallparts don't have a .part.content, but we don't want to stream tool calls anyway
-                                        if event.part.has_content():
-                                            yield event.part.content
-                                    elif isinstance(event, PartDeltaEvent):
-
-                                        if isinstance(event.delta, TextPartDelta):
-                                            yield event.delta.content_delta
-
-                            set_status(label = "Answering...")
-                            st.write_stream(_extract_streamable_text(_sync_generator_from_async(request_stream)))
-
-                    elif Agent.is_call_tools_node(node):
-                        async with node.stream(run.ctx) as handle_stream:
-                            async for event in handle_stream:
-                                if isinstance(event, FunctionToolCallEvent):
-                                    args_str = ", ".join(f"{k}={json.dumps(v)}" for k, v in event.part.args_as_dict().items())
-                                    if len(args_str) > 50:
-                                        args_str = args_str[:50] + "..."
-                                    set_status(label = f"Calling tool: {event.part.tool_name}({args_str})")
-                                elif isinstance(event, FunctionToolResultEvent):
-                                    set_status(label = f"Processing {event.result.tool_name} result")
+            result, partial_messages, timeout_reason = await _stream_agent_turn(prompt, current_agent_config)
 
         _reset_status()
-        result = run.result
+
+        # text streamed by abandoned (timed out or out-raced) requests is kept, shown before the final response
+        current_agent_config._delayed_messages.extend(partial_messages)
         
         if not result:
-            current_display_messages.append(DisplayMessage(ModelResponse(parts=[TextPart(content="No response from agent. Something went wrong. Please try again later.")])))
+            current_display_messages.append(DisplayMessage(model_message=ModelRequest(parts=[UserPromptPart(content=prompt)])))
+            current_display_messages.extend(current_agent_config._delayed_messages)
+            if timeout_reason is not None:
+                # the status box showing why is cleared once the turn ends, so the reason goes in the chat
+                no_response_text = f"No response from agent: the model did not respond in time ({_latency_reason_text(timeout_reason)}). Please try again later."
+            else:
+                no_response_text = "No response from agent. Something went wrong. Please try again later."
+            current_display_messages.append(DisplayMessage(model_message=ModelResponse(parts=[TextPart(content=no_response_text)])))
+            current_agent_config._delayed_messages = []
 
         if result:
             messages = result.new_messages()
@@ -336,8 +732,25 @@ async def _process_input(prompt):
     if not current_agent_config._has_had_first_interaction:
         current_agent_config._has_had_first_interaction = True
 
-    st.session_state.lock_widgets = False  # Step 5: Unlock the UI   
-    st.rerun()
+    _journal_turn(current_agent_config, current_history[history_start:], current_display_messages[display_start:])
+
+    if result and current_agent_config.suggestion_generator is not None:
+        _start_suggestions(current_agent_config)
+
+    duration = time.monotonic() - turn_started
+    request_tokens = (current_agent_config._usage.request_tokens or 0) - request_tokens_start
+    response_tokens = (current_agent_config._usage.response_tokens or 0) - response_tokens_start
+    st.session_state.logger.info({"event": "turn_complete",
+                                  "success": bool(result),
+                                  "duration_seconds": round(duration, 3),
+                                  "request_tokens": request_tokens,
+                                  "response_tokens": response_tokens})
+
+    agent_name = _current_agent_name()
+    metrics.TURNS.inc(agent=agent_name, outcome="success" if result else "no_response")
+    metrics.TURN_SECONDS.observe(duration, agent=agent_name)
+    metrics.TOKENS.inc(request_tokens, agent=agent_name, kind="request")
+    metrics.TOKENS.inc(response_tokens, agent=agent_name, kind="response")
 
 # call_render_func is a deprecated name for render_in_chat
 async def call_render_func(render_func_name: str, render_args: dict, before_agent_response: bool = False):
@@ -412,12 +825,16 @@ async def _render_message(dmessage: DisplayMessage):
             #  TextPart (with a .content and .has_content()), 
             #  ToolCallPart (with .tool_name, .args, .tool_call_id, and .args_as_dict()),
             #  ThinkingPart (with .content, .id, .signature (for anthropic models), and .has_content())
-            # we'll only render TextPart for now; other info will be available in Full context
-            if any(isinstance(part, TextPart) for part in message.parts):
+            # we render TextPart and ThinkingPart (collapsed); other info will be available in Full context
+            # as while streaming, thinking with nothing visible in it (e.g. a lone newline) isn't shown
+            if any(isinstance(part, TextPart) or (isinstance(part, ThinkingPart) and part.content.strip()) for part in message.parts):
                 with st.chat_message("assistant", avatar = current_agent_config.agent_avatar):
                     for part in message.parts:
                         if isinstance(part, TextPart):
                             st.markdown(part.content, unsafe_allow_html=True)
+                        elif isinstance(part, ThinkingPart) and part.content.strip():
+                            with st.expander("💭 Thinking", expanded=False):
+                                st.markdown(part.content, unsafe_allow_html=True)
 
 
         elif isinstance(message, ModelRequest):
@@ -462,6 +879,7 @@ async def _render_message(dmessage: DisplayMessage):
 def _log_error(error_message: str):
     """Render an error message in the Streamlit chat."""
     st.session_state.logger.error(error_message)
+    metrics.ERRORS.inc()
     if "show_modal_error_messages" in st.session_state.app_config and st.session_state.app_config.show_modal_error_messages:
         @st.dialog("Error")
         def error_dialog():
@@ -471,12 +889,39 @@ def _log_error(error_message: str):
         error_dialog()
 
 
+def _start_suggestions(agent_config):
+    """Start generating follow-up suggested questions in the background; they replace the current ones when ready."""
+    future = suggestions.request_suggestions(agent_config.suggestion_generator, agent_config._history_messages, agent_config.deps, agent_config.suggestion_count)
+    agent_config._suggestions_future = future
+    logger = st.session_state.logger
+
+    def apply(done):
+        # runs on a worker thread, or right away for cached results; a newer turn or a cleared chat supersedes this generation
+        if agent_config._suggestions_future is not done:
+            return
+        if done.exception() is not None:
+            logger.error(f"Error generating suggested questions: {done.exception()}")
+            metrics.ERRORS.inc()
+        else:
+            agent_config._current_suggested_questions = done.result()
+        agent_config._suggestions_future = None
+
+    future.add_done_callback(apply)
+
+
+@st.fragment(run_every=0.5)
+def _rerun_when_suggestions_ready(agent_name):
+    """Polls while suggested questions are generated in the background, rerunning the page once they are ready."""
+    if st.session_state.agent_configs[agent_name]._suggestions_future is None:
+        st.rerun()
+
+
 async def _render_suggested_questions():
     """Render suggested question buttons if configured using st.pills."""
     current_agent_config = _current_agent_config()
     
     # Only render if there are suggested questions configured
-    if not current_agent_config.suggested_questions:
+    if not current_agent_config.suggested_questions and current_agent_config.suggestion_generator is None:
         return
     
     # Check if user has hidden suggested questions via settings
@@ -492,6 +937,10 @@ async def _render_suggested_questions():
         await _process_input(question_to_process)
         return
     
+    # Follow-up questions are still being generated in the background; show them when they arrive
+    if current_agent_config._suggestions_future is not None:
+        _rerun_when_suggestions_ready(_current_agent_name())
+
     # Get current questions (no permanent filtering - questions can be reused)
     available_questions = current_agent_config._current_suggested_questions
     
@@ -521,7 +970,8 @@ async def _render_suggested_questions():
 
 
 async def _handle_chat_input():
-    if prompt := st.chat_input(disabled=st.session_state.lock_widgets, on_submit=_lock_ui, key = "chat_input"):
+    submitted_prompt = st.session_state.pop("submitted_prompt", None)
+    if prompt := st.chat_input(disabled=st.session_state.lock_widgets, on_submit=_submit_chat_input, key = "chat_input") or submitted_prompt:
         await _process_input(prompt)
         return
 
@@ -537,6 +987,7 @@ def _share_session():
             "access_count": 0,
             "agent_configs": {name: config.serializable_dict() for name, config in st.session_state.agent_configs.items()},
             "current_agent_name": st.session_state.current_agent_name,
+            "fan_out_agent_names": st.session_state.get("fan_out_agent_names", []),
             "show_function_calls": st.session_state.show_function_calls,
             "show_suggested_questions": st.session_state.show_suggested_questions,
             "sidebar_collapsed": st.session_state.app_config.sidebar_collapsed,
@@ -551,6 +1002,7 @@ def _share_session():
         # save the chat with a new TTL
         new_ttl_seconds = st.session_state.app_config.share_chat_ttl_seconds
         redis.set(key, state_data, ex=new_ttl_seconds)
+        metrics.SHARES.inc()
 
         # display the share dialog
         url = urllib.parse.quote(key)
@@ -602,35 +1054,133 @@ def _rehydrate_state():
     st.session_state.show_suggested_questions = state_data.get("show_suggested_questions", True)  # Default to True for backwards compatibility
     st.session_state.app_config.sidebar_collapsed = state_data["sidebar_collapsed"] # this isn't actually respected by Streamlit...
     st.session_state.current_agent_name = state_data["current_agent_name"]
+    st.session_state.fan_out_agent_names = state_data.get("fan_out_agent_names", [])  # Default to no fan-out for backwards compatibility
 
     # load the agent configs from the state data
     agent_configs = {}
     for name, config_data in state_data["agent_configs"].items():
-        session_agent = st.session_state.agent_configs[name].agent
-        session_sidebar_func = st.session_state.agent_configs[name].sidebar_func
-        session_deps = st.session_state.agent_configs[name].deps
-        session_rendering_functions = st.session_state.agent_configs[name].rendering_functions
-        agent_config = AgentConfig.from_serializable(config_data, agent=session_agent, sidebar_func=session_sidebar_func, deps=session_deps)
-        # Restore rendering_functions from session state (can't be serialized)
-        agent_config.rendering_functions = session_rendering_functions
-        agent_configs[name] = agent_config
+        agent_configs[name] = _restore_agent_config(name, config_data)
 
     # now we can replace the current session state agent configs
     st.session_state.agent_configs = agent_configs
+    _register_live_session()
+    metrics.REHYDRATES.inc(source="share")
 
+    # start this session's journal from the shared state, so it can be rebuilt without the share link
+    _journal_entries([journal.snapshot_entry(name, config_data) for name, config_data in state_data["agent_configs"].items()])
 
-# Main Streamlit UI
-async def _main():
-    if "session_id" in st.query_params and "hydrated" not in st.session_state:
-        st.session_state["hydrated"] = True
-        _rehydrate_state()
 
+def _restore_agent_config(name, config_data):
+    """Rebuild an agent config from its serializable dict, reattaching the session's unserializable pieces."""
+    session_agent = st.session_state.agent_configs[name].agent
+    session_sidebar_func = st.session_state.agent_configs[name].sidebar_func
+    session_deps = st.session_state.agent_configs[name].deps
+    session_rendering_functions = st.session_state.agent_configs[name].rendering_functions
+    session_fallback_model = st.session_state.agent_configs[name].fallback_model
+    session_suggestion_generator = st.session_state.agent_configs[name].suggestion_generator
+    agent_config = AgentConfig.from_serializable(config_data, agent=session_agent, sidebar_func=session_sidebar_func, deps=session_deps, fallback_model=session_fallback_model, suggestion_generator=session_suggestion_generator)
+    # Restore rendering_functions from session state (can't be serialized)
+    agent_config.rendering_functions = session_rendering_functions
+    return agent_config
 
-    await _render_sidebar()
 
-    current_config = _current_agent_config()
+def _journal_entries(entries):
+    """Queue entries for this session's journal, if journaling is enabled. Writing happens in the background."""
+    store = st.session_state.app_config.journal_store
+    if store is not None and "journal_id" in st.session_state:
+        journal.append_entries(store, st.session_state.journal_id, entries)
+
 
-    st.header(st.session_state.current_agent_name)
+def _journal_turn(agent_config, history_messages, display_messages):
+    """Journal the messages added by a finished turn, along with the agent's usage and state after it."""
+    if st.session_state.app_config.journal_store is None:
+        return
+
+    deps_state = None
+    if agent_config.deps is not None and hasattr(agent_config.deps, "state"):
+        deps_state = agent_config.deps.state
+    try:
+        entry = journal.turn_entry(_current_agent_name(), history_messages, display_messages, agent_config._usage, agent_config._current_suggested_questions, deps_state)
+    except Exception as e:
+        st.session_state.logger.error(f"Error serializing deps.state for the session journal, journaling turn without it: {e}")
+        entry = journal.turn_entry(_current_agent_name(), history_messages, display_messages, agent_config._usage, agent_config._current_suggested_questions)
+    _journal_entries([entry])
+
+
+def _attach_journal():
+    """Attach the session to a new journal, rebuilding its chats first from the journal given by the journal_id query parameter, if any.
+
+    If that journal already has entries (e.g. after a restart, or when served by another replica), the session's
+    chats are rebuilt from them and the session continues in a new journal, seeded with a snapshot of its state
+    that names the journal it continues. The snapshot is serialized by the background writer.
+    A journal is only ever written by the session that started it, so a journal URL opened in several tabs (or
+    shared with someone else) can't interleave turns from different sessions.
+    """
+    store = st.session_state.app_config.journal_store
+    if store is None or "journal_id" in st.session_state:
+        return
+
+    replayed = 0
+    journal_id = st.query_params.get("journal_id")
+    if journal_id is not None and journal.JOURNAL_ID_PATTERN.match(journal_id):
+        try:
+            replayed = _replay_journal(store, journal_id)
+            if replayed > 0:
+                # the journal starts with a snapshot of any shared session it came from, so don't load that again
+                st.session_state["hydrated"] = True
+        except Exception as e:
+            _log_error(f"Error rebuilding session from journal {journal_id}: {e}")
+
+    st.session_state.journal_id = uuid.uuid4().hex
+    st.query_params["journal_id"] = st.session_state.journal_id
+    if replayed > 0:
+        entries = []
+        for name, agent_config in st.session_state.agent_configs.items():
+            deps_state = None
+            if agent_config.deps is not None and hasattr(agent_config.deps, "state"):
+                deps_state = agent_config.deps.state
+            try:
+                entries.append(journal.continuation_entry(name, agent_config, journal_id, deps_state))
+            except Exception as e:
+                st.session_state.logger.error(f"Error serializing deps.state for the session journal, journaling snapshot without it: {e}")
+                entries.append(journal.continuation_entry(name, agent_config, journal_id))
+        _journal_entries(entries)
+
+
+def _replay_journal(store, journal_id):
+    """Apply a journal's entries to the session's agent configs, returning the number of entries applied."""
+    count = 0
+    for entry in journal.read_journal(store, journal_id):
+        name = entry["agent"]
+        if name not in st.session_state.agent_configs:
+            st.session_state.logger.warning(f"Skipping journal entry for unknown agent {name!r}")
+            continue
+
+        if entry["type"] == "snapshot":
+            st.session_state.agent_configs[name] = _restore_agent_config(name, entry["config"])
+        elif entry["type"] == "clear":
+            with _agent_context(name):
+                _clear_chat_agent()
+        elif entry["type"] == "turn":
+            agent_config = st.session_state.agent_configs[name]
+            agent_config._history_messages.extend(entry["history_messages"])
+            agent_config._display_messages.extend(entry["display_messages"])
+            agent_config._usage = entry["usage"]
+            agent_config._current_suggested_questions = entry["suggested_questions"]
+            agent_config._has_had_first_interaction = True
+            if entry["deps_state"] is not None and agent_config.deps is not None:
+                agent_config.deps.state = entry["deps_state"]
+        count += 1
+
+    st.session_state.logger.info(f"Rebuilt session from journal {journal_id} ({count} entries)")
+    if count > 0:
+        metrics.REHYDRATES.inc(source="journal")
+    return count
+
+
+async def _render_chat():
+    """Render the greeting and chat messages of the current agent."""
+    current_config = _current_agent_config()
 
     with st.chat_message("assistant", avatar = current_config.agent_avatar):
         st.write(current_config.greeting, unsafe_allow_html=True)
@@ -638,18 +1188,56 @@ async def _main():
     for message in current_config._display_messages:
         await _render_message(message)
 
+
+# Main Streamlit UI
+async def _main():
+    _attach_journal()
+
+    if "session_id" in st.query_params and "hydrated" not in st.session_state:
+        st.session_state["hydrated"] = True
+        _rehydrate_state()
+
+
+    await _render_sidebar()
+
+    fan_out_names = _fan_out_agent_names()
+    if fan_out_names:
+        st.header(" vs. ".join(fan_out_names))
+        columns = st.columns(len(fan_out_names))
+        for column, agent_name in zip(columns, fan_out_names):
+            with column, _agent_context(agent_name):
+                st.subheader(agent_name)
+                await _render_chat()
+    else:
+        st.header(st.session_state.current_agent_name)
+        await _render_chat()
+
     await _render_suggested_questions()
 
     await _handle_chat_input()
 
 
+def _log_context():
+    """Session context attached to every log record written from a script thread."""
+    ctx = get_script_run_ctx(suppress_warning=True)
+    if ctx is None:
+        return {}
+    context = {"session_id": ctx.session_id, "turn_id": _turn_id.get()}
+    if "current_agent_name" in ctx.session_state:
+        context["agent"] = _current_agent_name()
+    return context
+
+
 def _initialize_logger():
-    """Initialize the logger for the app."""
+    """Initialize the logger for the app.
+
+    Logging goes through a process-wide queue-based pipeline (see opaiui.log), so records are
+    written as JSON by a background thread rather than by the script thread.
+    """
+    sample_rates = st.session_state.app_config.log_sample_rates if "app_config" in st.session_state else None
+    log.configure_logging(level=logging.INFO, sample_rates=sample_rates, context_func=_log_context)
     if "logger" not in st.session_state:
         st.session_state.logger = logging.getLogger(__name__)
-        st.session_state.logger.handlers = []
-        st.session_state.logger.setLevel(logging.INFO)
-        st.session_state.logger.addHandler(logging.StreamHandler())
 
 def get_logger():
     """Get the logger for the app."""
@@ -658,6 +1246,49 @@ def get_logger():
     return st.session_state.logger
 
 
+def _start_metrics(config: AppConfig):
+    """Count this session in the process-wide metrics, and start the configured metrics exporters (once per process)."""
+    metrics.ACTIVE_SESSIONS.inc()
+    # the session's state is dropped when the browser session ends, which runs this finalizer
+    st.session_state.metrics_session_marker = _SessionMarker()
+    weakref.finalize(st.session_state.metrics_session_marker, metrics.ACTIVE_SESSIONS.dec)
+
+    try:
+        if config.metrics_port is not None:
+            metrics.start_http_server(config.metrics_port, config.metrics_host)
+        if config.metrics_file is not None:
+            metrics.start_file_writer(config.metrics_file, config.metrics_file_interval_seconds)
+    except Exception as e:
+        st.session_state.logger.error(f"Error starting metrics exporter: {e}")
+
+
+class _SessionMarker:
+    """Placeholder object whose lifetime matches the session's state."""
+
+
+class _LiveSession:
+    """Kept in the session's state, so it lives as long as the session, holding the session's current agent configs."""
+
+    def __init__(self):
+        self.agent_configs = {}
+
+
+# session id -> live session, for each browser session open in this process (see opaiui.export.live_sessions)
+_live_sessions = weakref.WeakValueDictionary()
+
+
+def _register_live_session():
+    """Register the session in _live_sessions, or update its entry; called on every script run, as agent configs may be replaced."""
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return
+    # ctx.session_state is replaced on each script run, so the registry refers to an object stored in it instead
+    if "live_session" not in st.session_state:
+        st.session_state.live_session = _LiveSession()
+    st.session_state.live_session.agent_configs = st.session_state.agent_configs
+    _live_sessions[ctx.session_id] = st.session_state.live_session
+
+
 def serve(config: AppConfig, agent_configs: Dict[str, AgentConfig]) -> None:
     """Serve the app with the given configuration."""
 
@@ -689,9 +1320,12 @@ def serve(config: AppConfig, agent_configs: Dict[str, AgentConfig]) -> None:
         st.session_state.current_agent_name = list(agent_configs.keys())[0]  # Default to the first agent
         st.session_state.show_function_calls = config.show_function_calls
         st.session_state.show_suggested_questions = True  # Default to showing suggested questions
+        st.session_state.fan_out_agent_names = []
 
-        if "logger" not in st.session_state:
-            _initialize_logger()
+        _initialize_logger()
+        _start_metrics(config)
+        if config.enable_warmup:
+            warmup.start(agent_configs, toolsets = config.warmup_toolsets)
 
         # if they have any rendering_functions in the AppConfig, print a deprecation warning
         if config.rendering_functions:
@@ -708,11 +1342,12 @@ def serve(config: AppConfig, agent_configs: Dict[str, AgentConfig]) -> None:
         page_settings = {
             "page_title": config.page_title,
             "page_icon": config.page_icon,
-            "layout": "centered",
+            "layout": "wide" if config.enable_fan_out else "centered",
             "initial_sidebar_state": sidebar_state,
             "menu_items": config.menu_items,
         }
 
         st.set_page_config(**page_settings)
 
+    _register_live_session()
     asyncio.run(_main())
\ No newline at end of file
@@ -0,0 +1,226 @@
+"""Bulk export of conversations for offline analysis.
+
+Sessions are read one at a time from the share store, a session journal, or the sessions open in this
+process, and written as one row per model message to newline-delimited JSON or Parquet. Rows are
+written as they are produced, so memory use doesn't grow with the size of the export:
+
+    python -m opaiui.export --source share --output shared.parquet
+    python -m opaiui.export --source journal --journal-dir ./journals --output journals.ndjson
+"""
+
+import argparse
+import base64
+import datetime
+import json
+import re
+import sys
+from typing import Any, Dict, IO, Iterable, Iterator, List, Optional, Tuple, Union
+
+import dill
+from pydantic_ai.messages import (ModelMessage, ModelRequest, ModelResponse, RetryPromptPart, SystemPromptPart,
+                                  TextPart, ToolCallPart, ToolReturnPart, UserPromptPart)
+from upstash_redis import Redis
+
+from opaiui import journal
+
+
+# a session source yields (session_id, agent_name, messages) tuples; a session may be yielded in several pieces, in order
+Session = Tuple[str, str, List[ModelMessage]]
+
+COLUMNS = ("source", "session_id", "agent", "message_index", "kind", "role", "timestamp", "model_name",
+           "tool_names", "content", "request_tokens", "response_tokens", "total_tokens")
+
+_SHARE_KEY_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+
+def _config_history(config_data: Dict[str, Any]) -> List[ModelMessage]:
+    encoded = config_data.get("_history_messages")
+    return dill.loads(base64.b64decode(encoded)) if encoded is not None else []
+
+
+def share_sessions(page_size: int = 100) -> Iterator[Session]:
+    """Yield the sessions saved with the Share button, from Upstash Redis (using UPSTASH_REDIS_REST_URL and UPSTASH_REDIS_REST_TOKEN)."""
+    redis = Redis.from_env()
+    try:
+        cursor = 0
+        while True:
+            cursor, keys = redis.scan(cursor, count=page_size)
+            for key in keys:
+                # shared sessions are keyed by a hash of their content; skip journals and other keys in the same database
+                if not _SHARE_KEY_PATTERN.match(key):
+                    continue
+                state_data_raw = redis.get(key)
+                if state_data_raw is None:
+                    continue
+                state_data = json.loads(state_data_raw)
+                for agent_name, config_data in state_data["agent_configs"].items():
+                    yield key, agent_name, _config_history(config_data)
+            if int(cursor) == 0:
+                break
+    finally:
+        redis.close()
+
+
+def journal_sessions(store: journal.JournalStore) -> Iterator[Session]:
+    """Yield the sessions recorded in a session journal store, including messages from before any chat was cleared.
+
+    A session reopened from its journal URL continues in a new journal, starting with a snapshot of the journal it
+    continues; those messages are exported with the earlier journal only, so each journal yields just its own turns
+    (and any shared session it was loaded from).
+    """
+    for journal_id in store.journal_ids():
+        for entry in journal.read_journal(store, journal_id):
+            if entry["type"] == "turn":
+                yield journal_id, entry["agent"], entry["history_messages"]
+            elif entry["type"] == "snapshot" and entry.get("parent") is None:
+                yield journal_id, entry["agent"], _config_history(entry["config"])
+
+
+def live_sessions() -> Iterator[Session]:
+    """Yield the sessions currently open in this process. Must be called from the process serving the app."""
+    from opaiui.app import _live_sessions
+
+    for session_id, live_session in list(_live_sessions.items()):
+        for agent_name, agent_config in list(live_session.agent_configs.items()):
+            yield session_id, agent_name, list(agent_config._history_messages)
+
+
+def _message_row(message: ModelMessage) -> Dict[str, Any]:
+    tool_names = []
+    content = []
+    if isinstance(message, ModelResponse):
+        role = "assistant"
+        timestamp = message.timestamp
+        for part in message.parts:
+            if isinstance(part, ToolCallPart):
+                tool_names.append(part.tool_name)
+            elif isinstance(part, TextPart):
+                content.append(part.content)
+        usage = message.usage
+        return {"kind": "response", "role": role, "timestamp": timestamp, "model_name": message.model_name,
+                "tool_names": tool_names, "content": "\n".join(content) or None,
+                "request_tokens": usage.request_tokens, "response_tokens": usage.response_tokens, "total_tokens": usage.total_tokens}
+
+    part_types = {type(part) for part in message.parts}
+    if UserPromptPart in part_types:
+        role = "user"
+    elif ToolReturnPart in part_types:
+        role = "tool"
+    elif RetryPromptPart in part_types:
+        role = "retry"
+    else:
+        role = "system"
+    timestamps = [part.timestamp for part in message.parts if getattr(part, "timestamp", None) is not None]
+    for part in message.parts:
+        if isinstance(part, (ToolReturnPart, RetryPromptPart)) and part.tool_name is not None:
+            tool_names.append(part.tool_name)
+        elif isinstance(part, (UserPromptPart, SystemPromptPart)) and isinstance(part.content, str):
+            content.append(part.content)
+    return {"kind": "request", "role": role, "timestamp": min(timestamps) if timestamps else None, "model_name": None,
+            "tool_names": tool_names, "content": "\n".join(content) or None,
+            "request_tokens": None, "response_tokens": None, "total_tokens": None}
+
+
+def message_rows(sessions: Iterable[Session], source: str) -> Iterator[Dict[str, Any]]:
+    """Yield one row per message in sessions, numbering each agent's messages in order within a session."""
+    current_session_id = None
+    next_index: Dict[str, int] = {}
+    for session_id, agent_name, messages in sessions:
+        if session_id != current_session_id:
+            current_session_id = session_id
+            next_index = {}
+        for message in messages:
+            index = next_index.get(agent_name, 0)
+            next_index[agent_name] = index + 1
+            yield {"source": source, "session_id": session_id, "agent": agent_name, "message_index": index, **_message_row(message)}
+
+
+def write_ndjson(rows: Iterable[Dict[str, Any]], output: Union[str, IO[str]]) -> int:
+    """Write rows as newline-delimited JSON to a path or text file object, returning the number of rows written."""
+    if isinstance(output, str):
+        with open(output, "w", encoding="utf-8") as f:
+            return write_ndjson(rows, f)
+
+    count = 0
+    for row in rows:
+        if isinstance(row["timestamp"], datetime.datetime):
+            row = dict(row, timestamp=row["timestamp"].isoformat())
+        output.write(json.dumps(row, default=str) + "\n")
+        count += 1
+    return count
+
+
+def write_parquet(rows: Iterable[Dict[str, Any]], path: str, batch_size: int = 10_000) -> int:
+    """Write rows to a Parquet file in row groups of batch_size, returning the number of rows written."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([("source", pa.string()),
+                        ("session_id", pa.string()),
+                        ("agent", pa.string()),
+                        ("message_index", pa.int64()),
+                        ("kind", pa.string()),
+                        ("role", pa.string()),
+                        ("timestamp", pa.timestamp("us", tz="UTC")),
+                        ("model_name", pa.string()),
+                        ("tool_names", pa.list_(pa.string())),
+                        ("content", pa.string()),
+                        ("request_tokens", pa.int64()),
+                        ("response_tokens", pa.int64()),
+                        ("total_tokens", pa.int64())])
+
+    count = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                count += len(batch)
+                batch = []
+        if batch or count == 0:
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+            count += len(batch)
+    return count
+
+
+def export(sessions: Iterable[Session], output: str, source: str, format: Optional[str] = None) -> int:
+    """Write sessions to output, as Parquet if format is "parquet" (or output ends in .parquet), otherwise as NDJSON.
+
+    Returns the number of rows written.
+    """
+    if format is None:
+        format = "parquet" if output.endswith(".parquet") else "ndjson"
+    rows = message_rows(sessions, source)
+    if format == "parquet":
+        return write_parquet(rows, output)
+    if format == "ndjson":
+        return write_ndjson(rows, output)
+    raise ValueError(f"Unknown export format: {format}. Use 'ndjson' or 'parquet'.")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m opaiui.export", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--source", choices=["share", "journal"], required=True, help="Export shared sessions from Upstash Redis, or journaled sessions.")
+    parser.add_argument("--journal-dir", default=None, help="Directory of a FileJournalStore. If not given, journals are read from Upstash Redis.")
+    parser.add_argument("--output", required=True, help="File to write; a .parquet extension selects Parquet unless --format is given.")
+    parser.add_argument("--format", choices=["ndjson", "parquet"], default=None)
+    args = parser.parse_args(argv)
+
+    # Upstash credentials usually live in .env, as for the app itself
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    if args.source == "share":
+        sessions = share_sessions()
+    elif args.journal_dir is not None:
+        sessions = journal_sessions(journal.FileJournalStore(args.journal_dir))
+    else:
+        sessions = journal_sessions(journal.RedisJournalStore())
+
+    count = export(sessions, args.output, args.source, args.format)
+    print(f"Wrote {count} rows to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+import abc
+import atexit
+import base64
+import copy
+import datetime
+import json
+import logging
+import os
+import queue
+import re
+import threading
+from typing import Any, Dict, Iterator, List, Optional
+
+import dill
+from upstash_redis import Redis
+
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+
+class JournalStore(abc.ABC):
+    """Base class for append-only session journals. Each journal is an ordered list of JSON lines."""
+
+    @abc.abstractmethod
+    def append(self, journal_id: str, entries: List[str]) -> None:
+        ...
+
+    @abc.abstractmethod
+    def read(self, journal_id: str) -> Iterator[str]:
+        ...
+
+    @abc.abstractmethod
+    def journal_ids(self) -> Iterator[str]:
+        """Yield the ids of all journals in the store, e.g. for bulk export."""
+        ...
+
+
+class FileJournalStore(JournalStore):
+    """Stores each journal as a newline-delimited JSON file in a (possibly shared) directory."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, journal_id: str) -> str:
+        return os.path.join(self.directory, f"{journal_id}.jsonl")
+
+    def append(self, journal_id: str, entries: List[str]) -> None:
+        with open(self._path(journal_id), "a", encoding="utf-8") as f:
+            f.write("".join(entry + "\n" for entry in entries))
+
+    def read(self, journal_id: str) -> Iterator[str]:
+        path = self._path(journal_id)
+        if not os.path.exists(path):
+            return
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                # a crash mid-write can leave a truncated last line; it is skipped rather than failing the replay
+                if line.endswith("\n"):
+                    yield line.rstrip("\n")
+
+    def journal_ids(self) -> Iterator[str]:
+        for name in sorted(os.listdir(self.directory)):
+            journal_id, extension = os.path.splitext(name)
+            if extension == ".jsonl" and JOURNAL_ID_PATTERN.match(journal_id):
+                yield journal_id
+
+
+class RedisJournalStore(JournalStore):
+    """Stores each journal as a Redis list on Upstash, using UPSTASH_REDIS_REST_URL and UPSTASH_REDIS_REST_TOKEN."""
+
+    def __init__(self, ttl_seconds: int = (60 * 60 * 24) * 30, key_prefix: str = "opaiui:journal:", page_size: int = 500):
+        self.ttl_seconds = ttl_seconds
+        self.key_prefix = key_prefix
+        self.page_size = page_size
+
+    def append(self, journal_id: str, entries: List[str]) -> None:
+        redis = Redis.from_env()
+        try:
+            key = self.key_prefix + journal_id
+            redis.rpush(key, *entries)
+            redis.expire(key, self.ttl_seconds)
+        finally:
+            redis.close()
+
+    def read(self, journal_id: str) -> Iterator[str]:
+        redis = Redis.from_env()
+        try:
+            key = self.key_prefix + journal_id
+            start = 0
+            while True:
+                page = redis.lrange(key, start, start + self.page_size - 1)
+                yield from page
+                if len(page) < self.page_size:
+                    break
+                start += self.page_size
+        finally:
+            redis.close()
+
+    def journal_ids(self) -> Iterator[str]:
+        redis = Redis.from_env()
+        try:
+            cursor = 0
+            while True:
+                cursor, keys = redis.scan(cursor, match=self.key_prefix + "*", count=self.page_size)
+                for key in keys:
+                    journal_id = key[len(self.key_prefix):]
+                    if JOURNAL_ID_PATTERN.match(journal_id):
+                        yield journal_id
+                if int(cursor) == 0:
+                    break
+        finally:
+            redis.close()
+
+
+def _encode(obj: Any) -> Optional[str]:
+    return base64.b64encode(dill.dumps(obj)).decode("utf-8") if obj is not None else None
+
+
+def _decode(data: Optional[str]) -> Any:
+    return dill.loads(base64.b64decode(data)) if data is not None else None
+
+
+def _now() -> str:
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+
+def turn_entry(agent_name: str, history_messages: list, display_messages: list, usage: Any, suggested_questions: List[str], deps_state: Any = None) -> Dict[str, Any]:
+    """A journal entry recording one finished turn: the messages it added and the agent's usage and state after it.
+
+    Messages are not modified after a turn finishes, so they are encoded later by the writer thread; the usage
+    and state objects are mutated by later turns, so they are copied here.
+    """
+    return {"type": "turn",
+            "agent": agent_name,
+            "timestamp": _now(),
+            "history_messages": list(history_messages),
+            "display_messages": list(display_messages),
+            "usage": copy.deepcopy(usage),
+            "suggested_questions": list(suggested_questions),
+            # deps.state may hold arbitrary objects, so it is serialized now rather than copied
+            "deps_state": _encode(deps_state)}
+
+
+def clear_entry(agent_name: str) -> Dict[str, Any]:
+    """A journal entry recording that an agent's chat was cleared."""
+    return {"type": "clear", "agent": agent_name, "timestamp": _now()}
+
+
+def snapshot_entry(agent_name: str, config_data: Dict[str, Any]) -> Dict[str, Any]:
+    """A journal entry holding an agent's full state (from AgentConfig.serializable_dict), e.g. after loading a shared session.
+
+    Snapshots that start a continued journal (see continuation_entry) also name the journal they continue, as "parent".
+    """
+    return {"type": "snapshot", "agent": agent_name, "timestamp": _now(), "config": config_data}
+
+
+def continuation_entry(agent_name: str, agent_config: Any, parent_journal_id: str, deps_state: Any = None) -> Dict[str, Any]:
+    """A snapshot entry starting a journal that continues another (parent_journal_id), holding an agent's full state.
+
+    The state (an AgentConfig) is serialized later by the writer thread, from a copy taken here: as for turn
+    entries, the message lists are copied and the usage deep-copied, while deps.state is serialized now.
+    """
+    state = agent_config.model_copy(update={"deps": None})
+    state._history_messages = list(agent_config._history_messages)
+    state._display_messages = list(agent_config._display_messages)
+    state._usage = copy.deepcopy(agent_config._usage)
+    state._current_suggested_questions = list(agent_config._current_suggested_questions)
+    return {"type": "snapshot",
+            "agent": agent_name,
+            "timestamp": _now(),
+            "parent": parent_journal_id,
+            "state": state,
+            "deps_state": _encode(deps_state)}
+
+
+def _serialize_entry(entry: Dict[str, Any]) -> str:
+    if entry["type"] == "snapshot" and "state" in entry:
+        config = entry["state"].serializable_dict()
+        config["deps_state"] = entry["deps_state"]
+        entry = {"type": "snapshot", "agent": entry["agent"], "timestamp": entry["timestamp"], "parent": entry["parent"], "config": config}
+    elif entry["type"] == "turn":
+        entry = dict(entry,
+                     history_messages=_encode(entry["history_messages"]),
+                     display_messages=_encode(entry["display_messages"]),
+                     usage=_encode(entry["usage"]))
+    return json.dumps(entry)
+
+
+def decode_entry(line: str) -> Dict[str, Any]:
+    """Parse a journal line back into an entry, decoding any serialized objects."""
+    entry = json.loads(line)
+    if entry["type"] == "turn":
+        entry["history_messages"] = _decode(entry["history_messages"]) or []
+        entry["display_messages"] = _decode(entry["display_messages"]) or []
+        entry["usage"] = _decode(entry["usage"])
+        entry["deps_state"] = _decode(entry["deps_state"])
+    return entry
+
+
+def read_journal(store: JournalStore, journal_id: str) -> Iterator[Dict[str, Any]]:
+    """Yield the decoded entries of a journal, oldest first."""
+    for line in store.read(journal_id):
+        yield decode_entry(line)
+
+
+class _JournalWriter:
+    """Process-wide background thread that serializes and appends journal entries off the script thread."""
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, store: JournalStore, journal_id: str, entries: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="opaiui-journal-writer", daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+        self._queue.put((store, journal_id, entries))
+
+    def flush(self, timeout: float = 10.0) -> None:
+        """Wait (up to timeout seconds) for queued entries to be written."""
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if isinstance(item, threading.Event):
+                item.set()
+                continue
+
+            store, journal_id, entries = item
+            try:
+                store.append(journal_id, [_serialize_entry(entry) for entry in entries])
+            except Exception as e:
+                logger.error(f"Error writing to session journal {journal_id}: {e}")
+
+
+_writer = _JournalWriter()
+
+
+def append_entries(store: JournalStore, journal_id: str, entries: List[Dict[str, Any]]) -> None:
+    """Queue entries to be appended to a journal by the background writer; returns immediately."""
+    _writer.submit(store, journal_id, entries)
+
+
+def flush(timeout: float = 10.0) -> None:
+    """Wait (up to timeout seconds) for all queued journal entries to be written."""
+    if _writer._thread is not None:
+        _writer.flush(timeout)
@@ -0,0 +1,327 @@
+"""Load test an opaiui app with simulated browser sessions and a fake model.
+
+Starts a local Streamlit server running an opaiui app whose agent uses a pydantic-ai FunctionModel
+(no network or API keys needed), opens N sessions over Streamlit's websocket protocol, and runs a
+scripted conversation in each. Reports time to first token, inter-token gaps, rerun latency, and
+server CPU and memory at each concurrency level:
+
+    python -m opaiui.loadtest --sessions 1,5,10,20 --turns 3 --token-rate 50 --tool-latency 0.5
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+from typing import Dict, List, Optional, Tuple
+
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+
+TOKEN_PREFIX = "tok"
+_FINISHED_EARLY_FOR_RERUN = ForwardMsg.ScriptFinishedStatus.Value("FINISHED_EARLY_FOR_RERUN")
+
+
+def _serve_app(args: argparse.Namespace) -> None:
+    """The app under test; runs inside `streamlit run`."""
+    from pydantic_ai import Agent
+    from pydantic_ai.messages import ToolReturnPart, UserPromptPart
+    from pydantic_ai.models.function import DeltaToolCall, FunctionModel
+    from opaiui import AgentConfig, AppConfig
+    from opaiui.app import serve
+
+    async def stream(messages, info):
+        if args.tool_latency > 0 and not any(isinstance(part, ToolReturnPart) for part in messages[-1].parts):
+            yield {0: DeltaToolCall(name="lookup", json_args=json.dumps({"query": "load test"}))}
+            return
+        # tokens are tagged with the turn number, so clients can tell them from earlier responses being redrawn
+        turn = sum(isinstance(part, UserPromptPart) for message in messages for part in message.parts)
+        for i in range(args.tokens):
+            await asyncio.sleep(1.0 / args.token_rate)
+            yield f"{_token_marker(turn)}{i} "
+
+    agent = Agent(FunctionModel(stream_function=stream))
+
+    @agent.tool_plain
+    async def lookup(query: str) -> str:
+        """Look up information about the query."""
+        await asyncio.sleep(args.tool_latency)
+        return f"Results for {query}"
+
+    serve(AppConfig(page_title="opaiui load test"), {"Load Test Agent": AgentConfig(agent=agent)})
+
+
+def _token_marker(turn: int) -> str:
+    return f"{TOKEN_PREFIX}{turn}-"
+
+
+def _percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def _process_stats(pid: int) -> Optional[Tuple[float, int]]:
+    """CPU seconds used and resident memory in bytes of a process, or None if unavailable on this platform."""
+    try:
+        import psutil
+        process = psutil.Process(pid)
+        cpu = process.cpu_times()
+        return cpu.user + cpu.system, process.memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # the command name (field 2) may contain spaces, so fields are counted from after it
+            fields = f.read().rsplit(")", 1)[1].split()
+        cpu_seconds = (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+        with open(f"/proc/{pid}/status") as f:
+            rss_kb = next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+        return cpu_seconds, rss_kb * 1024
+    except (OSError, StopIteration, IndexError, ValueError):
+        return None
+
+
+class _SessionResults:
+    def __init__(self):
+        self.first_token_seconds: List[float] = []
+        self.token_gap_seconds: List[float] = []
+        self.rerun_seconds: List[float] = []
+        self.turn_seconds: List[float] = []
+        self.errors: List[str] = []
+
+
+class _Session:
+    """One simulated browser tab, speaking Streamlit's websocket protocol."""
+
+    def __init__(self, url: str, results: _SessionResults, timeout: float):
+        self.url = url
+        self.results = results
+        self.timeout = timeout
+        self.chat_input_id = None
+        self.websocket = None
+
+    async def _send_rerun(self, prompt: Optional[str] = None) -> float:
+        message = BackMsg()
+        message.rerun_script.query_string = ""
+        if prompt is not None:
+            widget = message.rerun_script.widget_states.widgets.add()
+            widget.id = self.chat_input_id
+            widget.chat_input_value.data = prompt
+        await self.websocket.send(message.SerializeToString())
+        return time.perf_counter()
+
+    async def _receive(self) -> ForwardMsg:
+        data = await asyncio.wait_for(self.websocket.recv(), self.timeout)
+        return ForwardMsg.FromString(data)
+
+    async def _wait_for_script(self) -> None:
+        """Read messages until a script run finishes without triggering another, noting the chat input's widget id."""
+        while True:
+            msg = await self._receive()
+            if msg.WhichOneof("type") == "delta" and msg.delta.WhichOneof("type") == "new_element":
+                if msg.delta.new_element.WhichOneof("type") == "chat_input":
+                    self.chat_input_id = msg.delta.new_element.chat_input.id
+            elif msg.WhichOneof("type") == "script_finished" and msg.script_finished != _FINISHED_EARLY_FOR_RERUN:
+                return
+
+    async def _turn(self, prompt: str, turn: int) -> None:
+        marker = _token_marker(turn)
+        start = await self._send_rerun(prompt)
+        last_token_time = None
+        last_body = None
+        streaming = True
+        while True:
+            msg = await self._receive()
+            kind = msg.WhichOneof("type")
+            if streaming and kind == "delta" and msg.delta.new_element.WhichOneof("type") == "markdown":
+                body = msg.delta.new_element.markdown.body
+                if body.startswith(marker) and body != last_body:
+                    now = time.perf_counter()
+                    if last_token_time is None:
+                        self.results.first_token_seconds.append(now - start)
+                    else:
+                        self.results.token_gap_seconds.append(now - last_token_time)
+                    last_token_time, last_body = now, body
+            elif kind == "script_finished":
+                if msg.script_finished == _FINISHED_EARLY_FOR_RERUN:
+                    # the turn's run reruns the script to redraw the finished chat; that redraw is not streaming
+                    streaming = False
+                    continue
+                break
+        if last_token_time is None:
+            raise RuntimeError("turn finished without streaming any tokens")
+        self.results.turn_seconds.append(time.perf_counter() - start)
+
+    async def _rerun(self) -> None:
+        start = await self._send_rerun()
+        await self._wait_for_script()
+        self.results.rerun_seconds.append(time.perf_counter() - start)
+
+    async def run(self, turns: int, think_time: float) -> None:
+        import websockets
+
+        try:
+            async with websockets.connect(self.url, max_size=None) as websocket:
+                self.websocket = websocket
+                await self._send_rerun()
+                await self._wait_for_script()
+                if self.chat_input_id is None:
+                    raise RuntimeError("app did not render a chat input")
+                for turn in range(turns):
+                    await asyncio.sleep(think_time)
+                    await self._turn(f"Load test question {turn + 1}", turn + 1)
+                    # a widget interaction that doesn't start a turn, e.g. opening a sidebar control
+                    await self._rerun()
+        except Exception as e:
+            self.results.errors.append(f"{type(e).__name__}: {e}")
+
+
+def _start_server(args: argparse.Namespace) -> subprocess.Popen:
+    command = [sys.executable, "-m", "streamlit", "run", os.path.abspath(__file__),
+               "--server.headless", "true",
+               "--server.port", str(args.port),
+               "--server.address", "127.0.0.1",
+               "--server.fileWatcherType", "none",
+               "--browser.gatherUsageStats", "false",
+               "--",
+               "--serve-app",
+               "--tokens", str(args.tokens),
+               "--token-rate", str(args.token_rate),
+               "--tool-latency", str(args.tool_latency)]
+    log = open(args.server_log, "a") if args.server_log else subprocess.DEVNULL
+    server = subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT)
+
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Streamlit server exited with code {server.returncode}")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{args.port}/_stcore/health", timeout=1) as response:
+                if response.status == 200:
+                    return server
+        except OSError:
+            time.sleep(0.25)
+    server.terminate()
+    raise RuntimeError("Timed out waiting for the Streamlit server to start")
+
+
+async def _sample_rss(pid: int, peak: List[int], interval: float = 0.25) -> None:
+    while True:
+        stats = _process_stats(pid)
+        if stats is not None:
+            peak[0] = max(peak[0], stats[1])
+        await asyncio.sleep(interval)
+
+
+async def _run_level(args: argparse.Namespace, sessions: int) -> Dict[str, object]:
+    """Run one concurrency level against a fresh server, so memory and CPU figures aren't carried over."""
+    server = _start_server(args)
+    try:
+        url = f"ws://127.0.0.1:{args.port}/_stcore/stream"
+        results = [_SessionResults() for _ in range(sessions)]
+        stats_before = _process_stats(server.pid)
+        peak_rss = [stats_before[1] if stats_before else 0]
+        sampler = asyncio.create_task(_sample_rss(server.pid, peak_rss))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(_Session(url, result, args.timeout).run(args.turns, args.think_time) for result in results))
+        wall_seconds = time.perf_counter() - start
+
+        sampler.cancel()
+        stats_after = _process_stats(server.pid)
+    finally:
+        server.terminate()
+        server.wait()
+
+    def merged(field: str) -> List[float]:
+        return [value for result in results for value in getattr(result, field)]
+
+    report = {"sessions": sessions,
+              "turns_ok": len(merged("turn_seconds")),
+              "errors": merged("errors"),
+              "wall_seconds": wall_seconds,
+              "cpu_percent": None,
+              "peak_rss_mb": peak_rss[0] / 2**20 if stats_before else None}
+    if stats_before and stats_after:
+        report["cpu_percent"] = 100.0 * (stats_after[0] - stats_before[0]) / wall_seconds
+    for field in ("first_token_seconds", "token_gap_seconds", "rerun_seconds", "turn_seconds"):
+        values = merged(field)
+        report[field] = {f"p{pct}": _percentile(values, pct) for pct in (50, 95, 99)}
+    return report
+
+
+def _format_ms(seconds: Optional[float]) -> str:
+    return "-" if seconds is None else f"{seconds * 1000:.0f}"
+
+
+def _print_report(reports: List[Dict[str, object]]) -> None:
+    header = ["sessions", "turns", "errors",
+              "ttft p50/p95/p99 ms", "gap p50/p95/p99 ms", "rerun p50/p95/p99 ms",
+              "cpu %", "peak rss MB"]
+    rows = []
+    for report in reports:
+        row = [str(report["sessions"]), str(report["turns_ok"]), str(len(report["errors"]))]
+        for field in ("first_token_seconds", "token_gap_seconds", "rerun_seconds"):
+            row.append("/".join(_format_ms(report[field][f"p{pct}"]) for pct in (50, 95, 99)))
+        row.append("-" if report["cpu_percent"] is None else f"{report['cpu_percent']:.0f}")
+        row.append("-" if report["peak_rss_mb"] is None else f"{report['peak_rss_mb']:.0f}")
+        rows.append(row)
+
+    widths = [max(len(cells[i]) for cells in [header] + rows) for i in range(len(header))]
+    for cells in [header] + rows:
+        print("  ".join(cell.rjust(width) for cell, width in zip(cells, widths)))
+    for report in reports:
+        for error in sorted(set(report["errors"])):
+            print(f"{report['sessions']} sessions: {report['errors'].count(error)} x {error}", file=sys.stderr)
+
+
+def _parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m opaiui.loadtest", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sessions", default="1,5,10,20", help="Comma-separated concurrency levels to run, in order. (default: %(default)s)")
+    parser.add_argument("--turns", type=int, default=3, help="Chat turns per session. (default: %(default)s)")
+    parser.add_argument("--think-time", type=float, default=1.0, help="Seconds each session waits before sending a message. (default: %(default)s)")
+    parser.add_argument("--tokens", type=int, default=100, help="Tokens streamed per model response. (default: %(default)s)")
+    parser.add_argument("--token-rate", type=float, default=50.0, help="Tokens per second streamed by the fake model. (default: %(default)s)")
+    parser.add_argument("--tool-latency", type=float, default=0.5, help="Seconds the fake tool call takes before the response streams; 0 disables the tool call. (default: %(default)s)")
+    parser.add_argument("--port", type=int, default=8599, help="Port for the local Streamlit server. (default: %(default)s)")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Seconds a session waits for any server message before giving up. (default: %(default)s)")
+    parser.add_argument("--server-log", default=None, help="Append the server's output to this file, rather than discarding it.")
+    parser.add_argument("--json", action="store_true", help="Print one JSON report per level instead of a table.")
+    parser.add_argument("--serve-app", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.token_rate <= 0 or args.tokens <= 0:
+        parser.error("--tokens and --token-rate must be positive")
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = _parse_args(argv)
+    if args.serve_app:
+        _serve_app(args)
+        return
+
+    try:
+        import websockets  # noqa: F401
+    except ImportError:
+        sys.exit("The load tester needs the websockets package (installed with recent Streamlit releases): pip install websockets")
+
+    levels = [int(level) for level in args.sessions.split(",") if level.strip()]
+    reports = []
+    for sessions in levels:
+        report = asyncio.run(_run_level(args, sessions))
+        reports.append(report)
+        if args.json:
+            print(json.dumps(report))
+    if not args.json:
+        _print_report(reports)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import atexit
+import datetime
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import threading
+from typing import Any, Callable, Dict, Optional
+
+
+LOGGER_NAME = "opaiui"
+CONTEXT_FIELDS = ("session_id", "agent", "turn_id")
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as single-line JSON objects. Dict messages are merged into the object as fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+        }
+        for field in CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+
+        if isinstance(record.msg, dict):
+            entry.update(record.msg)
+        else:
+            entry["message"] = record.getMessage()
+
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class _ContextFilter(logging.Filter):
+    """Adds session context to records on the emitting thread, and drops sampled-out events."""
+
+    def __init__(self):
+        super().__init__()
+        self.context_func: Optional[Callable[[], Dict[str, Any]]] = None
+        self.sample_rates: Dict[str, float] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.sample_rates and isinstance(record.msg, dict):
+            rate = self.sample_rates.get(record.msg.get("event"))
+            if rate is not None and random.random() >= rate:
+                return False
+
+        if self.context_func is not None:
+            try:
+                for key, value in self.context_func().items():
+                    setattr(record, key, value)
+            except Exception:
+                # context is best-effort; never fail a log call because of it
+                pass
+        return True
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """A QueueHandler that leaves formatting to the listener thread, rather than doing it in the caller."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+_lock = threading.Lock()
+_filter = _ContextFilter()
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def configure_logging(level: int = logging.INFO,
+                      sample_rates: Optional[Dict[str, float]] = None,
+                      context_func: Optional[Callable[[], Dict[str, Any]]] = None,
+                      handler: Optional[logging.Handler] = None) -> logging.Logger:
+    """Set up the process-wide opaiui logging pipeline, and return the opaiui logger.
+
+    Records logged to the opaiui logger (and its children) are put on an in-memory queue, and a
+    background listener thread formats them as JSON and writes them to handler (stderr by default),
+    so logging never blocks on I/O in the calling thread. The pipeline is created on the first call;
+    later calls only update the level, sample rates, and context function.
+
+    Args:
+        level: Logging level for the opaiui logger.
+        sample_rates: Fraction of events to keep, keyed by the "event" field of dict messages.
+            Events not listed are always kept.
+        context_func: Called when a record is logged to get extra fields (e.g. session_id) to attach to it.
+        handler: Handler the listener writes to. Only used on the first call.
+    """
+    global _listener
+    logger = logging.getLogger(LOGGER_NAME)
+
+    with _lock:
+        if _listener is None:
+            log_queue = queue.SimpleQueue()
+            queue_handler = _DeferredQueueHandler(log_queue)
+            queue_handler.addFilter(_filter)
+
+            if handler is None:
+                handler = logging.StreamHandler(sys.stderr)
+            handler.setFormatter(JsonFormatter())
+
+            _listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+            _listener.start()
+            atexit.register(_listener.stop)
+
+            logger.handlers = [queue_handler]
+            # records are written by the listener only; propagating to root handlers would write them synchronously
+            logger.propagate = False
+
+        logger.setLevel(level)
+        if sample_rates is not None:
+            _filter.sample_rates = dict(sample_rates)
+        if context_func is not None:
+            _filter.context_func = context_func
+
+    return logger
@@ -0,0 +1,230 @@
+import abc
+import http.server
+import logging
+import math
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric(abc.ABC):
+    kind = ""
+
+    def __init__(self, registry: "MetricsRegistry", name: str, help: str, labels: Sequence[str] = ()):
+        self._lock = registry._lock
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._render_samples())
+        return lines
+
+    @abc.abstractmethod
+    def _render_samples(self) -> Iterable[str]:
+        ...
+
+
+class Counter(_Metric):
+    """A monotonically increasing value, optionally split by labels."""
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # unlabeled metrics are reported as 0 before their first update, as Prometheus expects
+        self._values: Dict[Tuple[str, ...], float] = {} if self.label_names else {(): 0.0}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _render_samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+
+
+class Gauge(Counter):
+    """A value that can go up and down, optionally split by labels."""
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    """Counts of observed values in cumulative buckets, with their sum, optionally split by labels."""
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * len(self.buckets), 0.0)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._values[key] = (counts, total + value)
+
+    def _render_samples(self):
+        with self._lock:
+            values = {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+        for key, (counts, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                yield f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.label_names, key)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.label_names, key)} {cumulative}"
+
+
+class MetricsRegistry:
+    """A process-wide set of metrics, rendered in the Prometheus text exposition format.
+
+    Updates take one short, process-wide lock; CPython has no atomic integers, and updates happen
+    a handful of times per agent turn, so the lock is effectively uncontended.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: List[_Metric] = []
+
+    def _register(self, metric: _Metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(self, name, help, labels))
+
+    def gauge(self, name: str, help: str, labels: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(self, name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(self, name, help, labels, buckets=buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+ACTIVE_SESSIONS = REGISTRY.gauge("opaiui_active_sessions", "Browser sessions currently open.")
+ACTIVE_RUNS = REGISTRY.gauge("opaiui_active_runs", "Agent turns currently running.", ["agent"])
+TURNS = REGISTRY.counter("opaiui_turns_total", "Agent turns finished, by outcome (success, no_response, error).", ["agent", "outcome"])
+TURN_SECONDS = REGISTRY.histogram("opaiui_turn_duration_seconds", "Wall time of agent turns.", ["agent"])
+FIRST_TOKEN_SECONDS = REGISTRY.histogram("opaiui_first_token_seconds", "Time from the start of a turn to its first streamed model output.", ["agent"])
+TOKENS = REGISTRY.counter("opaiui_tokens_total", "Model tokens used, by kind (request, response).", ["agent", "kind"])
+LATENCY_EVENTS = REGISTRY.counter("opaiui_latency_events_total", "Missed model deadlines, by action taken (hedge, failover, timeout).", ["agent", "event"])
+SHARES = REGISTRY.counter("opaiui_shares_total", "Sessions shared.")
+REHYDRATES = REGISTRY.counter("opaiui_rehydrates_total", "Sessions loaded from stored state, by source (share, journal).", ["source"])
+ERRORS = REGISTRY.counter("opaiui_errors_total", "Errors reported to users or the log by the app.")
+WARMUP_SECONDS = REGISTRY.gauge("opaiui_warmup_seconds", "Time taken by each step of the process's startup warm-up, and in total (step=\"total\").", ["step"])
+
+
+class _MetricsHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # scrapes are frequent; don't write an access log line for each
+        pass
+
+
+def write_metrics_file(path: str) -> None:
+    """Write the current metrics to path, atomically replacing it (e.g. for node_exporter's textfile collector)."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".opaiui-metrics-")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(REGISTRY.render())
+        os.replace(tmp_path, path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+
+
+_exporters_lock = threading.Lock()
+_started: Dict[str, object] = {}
+
+
+def start_http_server(port: int, host: str = "127.0.0.1") -> None:
+    """Serve the metrics at http://host:port/metrics from a background thread. Only the first call per process starts a server."""
+    with _exporters_lock:
+        if "http" in _started:
+            return
+        server = http.server.ThreadingHTTPServer((host, port), _MetricsHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="opaiui-metrics-http", daemon=True).start()
+        _started["http"] = server
+        logger.info(f"Serving metrics at http://{host}:{port}/metrics")
+
+
+def start_file_writer(path: str, interval_seconds: float = 15.0) -> None:
+    """Rewrite the metrics file every interval_seconds from a background thread. Only the first call per process starts a writer."""
+    with _exporters_lock:
+        if "file" in _started:
+            return
+
+        def run():
+            while True:
+                try:
+                    write_metrics_file(path)
+                except Exception as e:
+                    logger.error(f"Error writing metrics file {path}: {e}")
+                time.sleep(interval_seconds)
+
+        thread = threading.Thread(target=run, name="opaiui-metrics-file", daemon=True)
+        thread.start()
+        _started["file"] = thread
@@ -0,0 +1,178 @@
+import asyncio
+import collections
+import concurrent.futures
+import hashlib
+import inspect
+import json
+import logging
+import threading
+from typing import Any, List
+
+import httpx
+from pydantic_ai import Agent, models
+from pydantic_ai.providers import infer_provider_class
+from pydantic_ai.messages import ModelMessage, ModelRequest, ModelResponse, TextPart, ToolCallPart, UserPromptPart
+
+
+logger = logging.getLogger(__name__)
+
+CACHE_SIZE = 1024
+TRANSCRIPT_MESSAGES = 20
+
+_INSTRUCTIONS = ("You suggest follow-up questions for a chat between a user and an AI assistant. "
+                 "Given the conversation so far, write {count} short questions the user might ask next, "
+                 "in the user's voice, each answerable by the assistant. Don't repeat questions already asked.")
+
+
+def history_key(messages: List[ModelMessage]) -> str:
+    """A hash of the conversational content of messages (prompts, responses, and tool calls), ignoring timestamps and ids."""
+    content = []
+    for message in messages:
+        for part in message.parts:
+            if isinstance(part, (UserPromptPart, TextPart)):
+                content.append([part.part_kind, part.content if isinstance(part.content, str) else repr(part.content)])
+            elif isinstance(part, ToolCallPart):
+                content.append([part.part_kind, part.tool_name, part.args_as_json_str()])
+    return hashlib.sha256(json.dumps(content).encode("utf-8")).hexdigest()
+
+
+def _generator_name(generator: Any) -> str:
+    # agents, models, and callbacks are usually recreated on each script run, so they are keyed by what they are rather than by identity
+    if isinstance(generator, str):
+        return generator
+    if inspect.isfunction(generator):
+        return f"{generator.__module__}.{generator.__qualname__}"
+    return f"{type(generator).__qualname__}:{getattr(generator, 'model_name', '')}"
+
+
+def _transcript(messages: List[ModelMessage]) -> str:
+    lines = []
+    for message in messages[-TRANSCRIPT_MESSAGES:]:
+        for part in message.parts:
+            if isinstance(message, ModelRequest) and isinstance(part, UserPromptPart) and isinstance(part.content, str):
+                lines.append(f"User: {part.content}")
+            elif isinstance(message, ModelResponse) and isinstance(part, TextPart):
+                lines.append(f"Assistant: {part.content}")
+    return "\n\n".join(lines)
+
+
+async def _generate_with_model(model: Any, messages: List[ModelMessage], count: int) -> List[str]:
+    agent = Agent(model, output_type=List[str], instructions=_INSTRUCTIONS.format(count=count))
+    result = await agent.run(_transcript(messages))
+    return result.output
+
+
+def _own_model(model_name: str, http_client: httpx.AsyncClient) -> Any:
+    """Build a model from its name with a provider using http_client, rather than the HTTP client pool shared by the chat agents.
+
+    Providers without an httpx client of their own (e.g. Google's and Bedrock's) are built as usual.
+    """
+    model = models.infer_model(model_name)
+    provider_name = model_name.split(":", 1)[0] if ":" in model_name else model.system
+    if provider_name in ("google-gla", "google-vertex", "vertexai"):
+        return model
+    try:
+        provider_class = infer_provider_class(provider_name)
+    except Exception:
+        return model
+    if "http_client" not in inspect.signature(provider_class).parameters:
+        return model
+    return type(model)(model.model_name, provider=provider_class(http_client=http_client))
+
+
+class _SuggestionService:
+    """Process-wide background event loop that generates suggested questions off the script thread, caching model-generated results by history.
+
+    HTTP connection pools are tied to the event loop that opens them, so models given by name get providers with
+    the service's own HTTP client, used only on its loop; their connections never reach the chat agents' pool.
+    """
+
+    def __init__(self, max_concurrency: int = 4):
+        self._max_concurrency = max_concurrency
+        self._loop = None
+        self._lock = threading.Lock()
+        self._cache = collections.OrderedDict()
+        self._pending = {}
+        # only used on the service's loop
+        self._semaphore = None
+        self._http_client = None
+        self._models = {}
+
+    def request(self, generator: Any, messages: List[ModelMessage], deps: Any, count: int) -> concurrent.futures.Future:
+        # generator functions are given the session's deps, so their questions may depend on more than the history;
+        # only model-generated questions are cached and shared between sessions
+        if inspect.iscoroutinefunction(generator):
+            with self._lock:
+                return self._submit(generator, messages, deps, count)
+
+        key = (_generator_name(generator), count, history_key(messages))
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                future = concurrent.futures.Future()
+                future.set_result(list(self._cache[key]))
+                return future
+            # sessions with the same history (e.g. several visitors opening one shared chat) share one generation
+            if key in self._pending:
+                return self._pending[key]
+
+            future = self._submit(generator, messages, deps, count)
+            self._pending[key] = future
+
+        future.add_done_callback(lambda done: self._finish(key, done))
+        return future
+
+    def _submit(self, generator: Any, messages: List[ModelMessage], deps: Any, count: int) -> concurrent.futures.Future:
+        # called with self._lock held
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+            threading.Thread(target=self._loop.run_forever, name="opaiui-suggestions", daemon=True).start()
+        return asyncio.run_coroutine_threadsafe(self._generate(generator, list(messages), deps, count), self._loop)
+
+    async def _generate(self, generator: Any, messages: List[ModelMessage], deps: Any, count: int) -> List[str]:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._max_concurrency)
+        async with self._semaphore:
+            if inspect.iscoroutinefunction(generator):
+                questions = await generator(messages, deps)
+            else:
+                questions = await _generate_with_model(self._model(generator), messages, count)
+        return [str(question) for question in questions][:count]
+
+    def _model(self, generator: Any) -> Any:
+        if not isinstance(generator, str) or generator == "test":
+            return generator
+        if generator not in self._models:
+            if self._http_client is None:
+                # the same timeouts as Pydantic.AI's shared client
+                self._http_client = httpx.AsyncClient(timeout=httpx.Timeout(timeout=600, connect=5))
+            self._models[generator] = _own_model(generator, self._http_client)
+        return self._models[generator]
+
+    def _finish(self, key, future: concurrent.futures.Future) -> None:
+        with self._lock:
+            self._pending.pop(key, None)
+            if not future.cancelled() and future.exception() is None:
+                self._cache[key] = list(future.result())
+                while len(self._cache) > CACHE_SIZE:
+                    self._cache.popitem(last=False)
+
+
+_service = _SuggestionService()
+
+
+def request_suggestions(generator: Any, messages: List[ModelMessage], deps: Any = None, count: int = 3) -> concurrent.futures.Future:
+    """Start generating follow-up questions for a conversation in the background, returning a Future for the list of questions.
+
+    Args:
+        generator: A Pydantic.AI model (name or instance), asked for questions given a transcript of the conversation,
+            or an async function taking (messages, deps) and returning a list of questions. Generation runs on a
+            background event loop shared by all sessions, so functions shouldn't block it. Models given by name use
+            their own HTTP client; model instances should be given a provider with an http_client of their own,
+            as connections opened on this loop can't be reused from the chat agents' loops.
+        messages: The conversation's message history.
+        deps: The agent's deps, passed to generator functions. Questions from generator functions are never cached or shared
+            between sessions, as they may depend on deps; questions from models are, for conversations with the same history.
+        count: Maximum number of questions to return.
+    """
+    return _service.request(generator, messages, deps, count)
@@ -0,0 +1,187 @@
+import asyncio
+import concurrent.futures
+import logging
+import os
+import threading
+import time
+import urllib.parse
+from typing import Any, Dict, Optional, Tuple
+
+from pydantic_ai import models
+from upstash_redis import Redis
+
+from opaiui import metrics
+
+
+logger = logging.getLogger(__name__)
+
+SHARE_STORE_RETRY_SECONDS = 30.0
+
+_lock = threading.Lock()
+_started = False
+_share_store_check: Optional[concurrent.futures.Future] = None
+_share_store_checked_at = 0.0
+# cleared while warm-up is running the agents' toolsets
+_toolsets_idle = threading.Event()
+_toolsets_idle.set()
+
+
+def share_store_configured() -> bool:
+    return "UPSTASH_REDIS_REST_URL" in os.environ and "UPSTASH_REDIS_REST_TOKEN" in os.environ
+
+
+def _check_share_store() -> Tuple[bool, str]:
+    global _share_store_checked_at
+    redis = None
+    try:
+        redis = Redis.from_env()
+        return True, str(redis.dbsize())
+    except Exception as e:
+        return False, str(e)
+    finally:
+        _share_store_checked_at = time.monotonic()
+        if redis is not None:
+            try:
+                redis.close()
+            except Exception as e:
+                logger.error(f"Error closing Redis connection: {e}")
+
+
+def _share_store_future() -> concurrent.futures.Future:
+    """The process-wide share store check, started if needed. A failed check is retried after SHARE_STORE_RETRY_SECONDS."""
+    global _share_store_check
+    with _lock:
+        check = _share_store_check
+        retry = (check is not None and check.done() and not check.result()[0]
+                 and time.monotonic() - _share_store_checked_at > SHARE_STORE_RETRY_SECONDS)
+        if check is None or retry:
+            check = concurrent.futures.Future()
+            _share_store_check = check
+
+            def run():
+                check.set_result(_check_share_store())
+
+            threading.Thread(target=run, name="opaiui-share-store-check", daemon=True).start()
+        return check
+
+
+def share_store_status() -> Optional[Tuple[bool, str]]:
+    """Result of the process-wide share store check as (ok, database size or error), or None while it is running."""
+    check = _share_store_future()
+    return check.result() if check.done() else None
+
+
+async def _warm_model(model: Any) -> str:
+    # building the model creates its provider client, and the HTTP client and SSL context it shares with later runs
+    model = models.infer_model(model)
+    if model.base_url:
+        # HTTP connection pools are tied to the event loop that opens them, and each script run has its own loop,
+        # so connections can't usefully be opened here; resolving the host warms the resolver cache instead
+        url = urllib.parse.urlsplit(model.base_url)
+        if url.hostname:
+            await asyncio.get_running_loop().getaddrinfo(url.hostname, url.port or (443 if url.scheme == "https" else 80))
+    return model.model_name
+
+
+async def _warm_toolsets(agent: Any) -> str:
+    # entering the agent starts its MCP servers (downloading and caching their packages on first use); they are
+    # stopped again afterwards, as each turn runs them in its own event loop
+    async with agent:
+        pass
+    return "started and stopped"
+
+
+async def wait_for_toolsets() -> None:
+    """Wait until warm-up isn't running any agent's toolsets.
+
+    An agent's MCP servers can only run in one event loop at a time, so turns wait for the warm-up step using them.
+    """
+    if not _toolsets_idle.is_set():
+        await asyncio.to_thread(_toolsets_idle.wait)
+
+
+async def _timed(step: str, coroutine) -> bool:
+    started = time.monotonic()
+    try:
+        detail = await coroutine
+        ok = True
+    except Exception as e:
+        detail = f"{type(e).__name__}: {e}"
+        ok = False
+    seconds = time.monotonic() - started
+
+    metrics.WARMUP_SECONDS.set(seconds, step=step)
+    info = {"event": "warmup_step", "step": step, "ok": ok, "seconds": round(seconds, 3), "detail": detail}
+    if ok:
+        logger.info(info)
+    else:
+        logger.warning(info)
+    return ok
+
+
+async def _share_store_step() -> str:
+    ok, detail = await asyncio.wrap_future(_share_store_future())
+    if not ok:
+        raise ConnectionError(detail)
+    return f"{detail} keys"
+
+
+async def _warm_up(agent_configs: Dict[str, Any], toolsets: bool) -> None:
+    started = time.monotonic()
+    steps = []
+    toolset_steps = []
+    if share_store_configured():
+        steps.append(_timed("share_store", _share_store_step()))
+    for name, agent_config in agent_configs.items():
+        if agent_config.agent is None:
+            continue
+        if agent_config.agent.model is not None:
+            steps.append(_timed(f"{name}:model", _warm_model(agent_config.agent.model)))
+        if agent_config.fallback_model is not None:
+            steps.append(_timed(f"{name}:fallback_model", _warm_model(agent_config.fallback_model)))
+        generator = agent_config.suggestion_generator
+        if isinstance(generator, (str, models.Model)):
+            steps.append(_timed(f"{name}:suggestion_model", _warm_model(generator)))
+        if toolsets:
+            toolset_steps.append(_timed(f"{name}:toolsets", _warm_toolsets(agent_config.agent)))
+
+    async def run_toolsets():
+        try:
+            return await asyncio.gather(*toolset_steps)
+        finally:
+            _toolsets_idle.set()
+
+    results, toolset_results = await asyncio.gather(asyncio.gather(*steps), run_toolsets())
+    results = list(results) + list(toolset_results)
+    seconds = time.monotonic() - started
+    metrics.WARMUP_SECONDS.set(seconds, step="total")
+    logger.info({"event": "warmup_complete", "seconds": round(seconds, 3), "steps": len(results), "failed": results.count(False)})
+
+
+def _run(agent_configs: Dict[str, Any], toolsets: bool) -> None:
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(_warm_up(agent_configs, toolsets))
+    except Exception as e:
+        logger.error(f"Error during warm-up: {e}")
+    finally:
+        _toolsets_idle.set()
+        loop.close()
+
+
+def start(agent_configs: Dict[str, Any], toolsets: bool = False) -> None:
+    """Warm up the agents and share store in a background thread, so the first users don't pay for lazy initialization.
+
+    Models are built (along with their provider and HTTP clients) and their hosts resolved, and the share store
+    is checked, all concurrently. If toolsets is True, each agent's toolsets (e.g. MCP servers) are also started
+    and stopped; turns wait for this to finish (see wait_for_toolsets). Each step's time is logged and recorded in
+    metrics. Only the first call per process starts a warm-up; serving continues while it runs.
+    """
+    global _started
+    with _lock:
+        if _started:
+            return
+        _started = True
+        if toolsets:
+            _toolsets_idle.clear()
+    threading.Thread(target=_run, args=(dict(agent_configs), toolsets), name="opaiui-warmup", daemon=True).start()
@@ -0,0 +1,40 @@
+from streamlit.testing.v1 import AppTest
+
+
+def _app():
+    from pydantic_ai import Agent
+    from pydantic_ai.models.function import FunctionModel
+    from opaiui import AppConfig, AgentConfig
+    from opaiui.app import serve
+
+    async def stream(messages, info):
+        yield "reply to: "
+        yield messages[-1].parts[-1].content
+
+    serve(AppConfig(), {"Agent": AgentConfig(agent=Agent(FunctionModel(stream_function=stream)))})
+
+
+def _chat_texts(at):
+    return [[markdown.value for markdown in message.markdown] for message in at.chat_message]
+
+
+def test_submitted_prompt_reaches_the_agent():
+    # submitting locks the UI, which disables the chat input before the script reads it; Streamlit (1.66+)
+    # discards values of disabled widgets, so the prompt must be kept by the on_submit callback
+    at = AppTest.from_function(_app, default_timeout=30)
+    at.run()
+    at.chat_input[0].set_value("hello").run()
+
+    assert not at.exception
+    assert ["hello"] in _chat_texts(at)
+    assert ["reply to: hello"] in _chat_texts(at)
+    assert not at.chat_input[0].disabled
+
+
+def test_prompt_is_used_once():
+    at = AppTest.from_function(_app, default_timeout=30)
+    at.run()
+    at.chat_input[0].set_value("hello").run()
+    at.run()
+
+    assert _chat_texts(at).count(["hello"]) == 1
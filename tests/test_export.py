@@ -0,0 +1,46 @@
+from streamlit.testing.v1 import AppTest
+
+from opaiui import export, journal
+
+
+def _app(journal_dir):
+    from pydantic_ai import Agent
+    from pydantic_ai.models.function import FunctionModel
+    from opaiui import AppConfig, AgentConfig
+    from opaiui.app import serve
+    from opaiui.journal import FileJournalStore
+
+    async def stream(messages, info):
+        yield f"reply #{len(messages)}"
+
+    serve(AppConfig(journal_store=FileJournalStore(journal_dir)),
+          {"Agent": AgentConfig(agent=Agent(FunctionModel(stream_function=stream)))})
+
+
+def _open(journal_dir, journal_id=None):
+    at = AppTest.from_function(_app, args=(journal_dir,), default_timeout=30)
+    if journal_id is not None:
+        at.query_params["journal_id"] = journal_id
+    at.run()
+    return at
+
+
+def test_reopened_sessions_are_exported_once(tmp_path):
+    journal_dir = str(tmp_path)
+    at = _open(journal_dir)
+    at.chat_input[0].set_value("first").run()
+    at.chat_input[0].set_value("second").run()
+    journal_id = at.session_state["journal_id"]
+
+    # each reopening rebuilds the chat and continues it in a new journal
+    for _ in range(2):
+        journal.flush()
+        at = _open(journal_dir, journal_id)
+        assert at.session_state["journal_id"] != journal_id
+        journal_id = at.session_state["journal_id"]
+    at.chat_input[0].set_value("third").run()
+    journal.flush()
+
+    rows = list(export.message_rows(export.journal_sessions(journal.FileJournalStore(journal_dir)), "journal"))
+    assert [row["content"] for row in rows if row["role"] == "user"] == ["first", "second", "third"]
+    assert len(rows) == 6
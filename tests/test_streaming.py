@@ -0,0 +1,33 @@
+import time
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+
+def _app(thinking):
+    import asyncio
+
+    from pydantic_ai import Agent
+    from pydantic_ai.models.function import DeltaThinkingPart, FunctionModel
+    from opaiui import AppConfig, AgentConfig
+    from opaiui.app import serve
+
+    async def stream(messages, info):
+        yield {0: DeltaThinkingPart(content=thinking)}
+        await asyncio.sleep(1)
+        yield "done thinking"
+
+    serve(AppConfig(), {"Agent": AgentConfig(agent=Agent(FunctionModel(stream_function=stream)))})
+
+
+# a whitespace-only thinking part has nothing to draw, and used to leave the stream view redrawing it in a busy loop
+@pytest.mark.parametrize("thinking, shown", [("\n", []), ("hmm", ["hmm"])])
+def test_thinking_then_stall_finishes(thinking, shown):
+    at = AppTest.from_function(_app, args=(thinking,), default_timeout=30)
+    at.run()
+    started = time.monotonic()
+    at.chat_input[0].set_value("hello").run()
+
+    assert not at.exception
+    assert shown + ["done thinking"] in [[markdown.value for markdown in message.markdown] for message in at.chat_message]
+    assert time.monotonic() - started < 10
@@ -0,0 +1,73 @@
+import asyncio
+import http.server
+import json
+import threading
+
+import pytest
+from pydantic_ai import Agent
+from pydantic_ai.messages import ModelRequest, ModelResponse, TextPart, UserPromptPart
+
+from opaiui import suggestions
+
+
+class _FakeOpenAIHandler(http.server.BaseHTTPRequestHandler):
+    # keep-alive connections, so a client's pool holds on to them between requests
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if request.get("tools"):
+            message = {"role": "assistant", "content": None,
+                       "tool_calls": [{"id": "call_1", "type": "function",
+                                       "function": {"name": request["tools"][0]["function"]["name"],
+                                                    "arguments": json.dumps({"response": ["What next?", "Why?"]})}}]}
+        else:
+            message = {"role": "assistant", "content": "chat reply"}
+        body = json.dumps({"id": "1", "object": "chat.completion", "created": 0, "model": request["model"],
+                           "choices": [{"index": 0, "message": message, "finish_reason": "stop"}]}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def fake_openai(monkeypatch):
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _FakeOpenAIHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv("OPENAI_BASE_URL", f"http://127.0.0.1:{server.server_port}/v1")
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    yield
+    server.shutdown()
+    server.server_close()
+
+
+def _history(prompt):
+    return [ModelRequest(parts=[UserPromptPart(content=prompt)]), ModelResponse(parts=[TextPart(content="answer")])]
+
+
+def test_model_suggestions_leave_chat_connections_usable(fake_openai):
+    chat_agent = Agent("openai:gpt-4o-mini")
+    # each script run uses its own event loop
+    assert asyncio.run(chat_agent.run("hi")).output == "chat reply"
+
+    questions = suggestions.request_suggestions("openai:gpt-4o-mini", _history("first"), count=2).result(timeout=30)
+    assert questions == ["What next?", "Why?"]
+
+    assert asyncio.run(chat_agent.run("hi again")).output == "chat reply"
+    questions = suggestions.request_suggestions("openai:gpt-4o-mini", _history("second"), count=2).result(timeout=30)
+    assert questions == ["What next?", "Why?"]
+    assert asyncio.run(chat_agent.run("and again")).output == "chat reply"
+
+
+def test_generator_functions_are_not_shared_between_deps():
+    async def generator(messages, deps):
+        return [f"about {deps}"]
+
+    history = _history("hi")
+    assert suggestions.request_suggestions(generator, history, deps="cats").result(timeout=30) == ["about cats"]
+    assert suggestions.request_suggestions(generator, history, deps="dogs").result(timeout=30) == ["about dogs"]